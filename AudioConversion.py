@@ -0,0 +1,167 @@
+"""
+Conversion of captured int16 PCM to what Whisper takes: float32 mono at 16KHz, in-process instead of a temp WAV
+file decoded by ffmpeg. Streams are converted block by block as they are captured (StreamConverter,
+ModelRateReader), ``to_model_input`` converts a whole recording at once.
+"""
+from math import gcd
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+MODEL_SAMPLE_RATE = 16000  # whisper.audio.SAMPLE_RATE
+RESAMPLE_HALF_TAPS = 16  # windowed sinc taps on each side of an output sample
+RESAMPLE_PHASES = 512  # fractional positions the filter table is precomputed for
+RESAMPLE_ROLLOFF = 0.9  # low-pass cutoff as a share of the output Nyquist, leaves room for the transition band
+RESAMPLE_BLOCK = 8192  # output samples computed at once, bounds the temporary (block, taps) arrays
+
+def downmix(pcm, channels):
+    """Interleaved int16 PCM (bytes or array) to float32 mono in [-1, 1)"""
+    samples = np.frombuffer(pcm, dtype=np.int16) if isinstance(pcm, (bytes, bytearray, memoryview)) else pcm
+    frames = len(samples) // channels
+    # summing strided channel views beats reshape + mean by ~10x
+    mono = samples[0:frames * channels:channels].astype(np.float32)
+    for channel in range(1, channels):
+        mono += samples[channel:frames * channels:channels]
+    mono *= 1 / (32768 * channels)
+    return mono
+
+class Resampler:
+    """
+    Streaming windowed sinc resampler for any rate ratio.
+
+    With the ratio reduced to ``down / up`` (48KHz -> 16KHz is 3 / 1, 44.1KHz -> 16KHz is 441 / 160) output
+    sample ``k`` only depends on ``k % up`` for its filter phase, and every ``up`` outputs the input window
+    moves by ``down`` samples. So each phase is one matrix-vector product of a strided sliding-window view of
+    the input with that phase's taps, no gather. Ratios with more than RESAMPLE_PHASES phases fall back to a
+    table of quantized phases and gathered windows.
+
+    ``process`` keeps the input the next outputs still need (the filter state), so a stream converted block
+    by block comes out the same as converted at once and every input sample is converted exactly once.
+    ``flush`` pads the end with zeros to get the last outputs out.
+    """
+    def __init__(self, from_rate, to_rate=MODEL_SAMPLE_RATE):
+        self.from_rate = from_rate
+        self.to_rate = to_rate
+        divisor = gcd(from_rate, to_rate)
+        self.up, self.down = to_rate // divisor, from_rate // divisor
+        self.exact = self.up <= RESAMPLE_PHASES
+        fractions = (np.arange(self.up) * self.down % self.up) / self.up if self.exact else \
+            np.arange(RESAMPLE_PHASES + 1) / RESAMPLE_PHASES
+
+        half = RESAMPLE_HALF_TAPS
+        taps = np.arange(-half + 1, half + 1)
+        cutoff = min(1.0, to_rate / from_rate) * RESAMPLE_ROLLOFF
+        offsets = fractions[:, None] - taps[None, :]
+        table = np.sinc(cutoff * offsets) * (0.5 + 0.5 * np.cos(np.pi * np.clip(offsets / half, -1, 1)))
+        self.table = (table / table.sum(axis=1, keepdims=True)).astype(np.float32)  # unity gain at DC
+        self.reset()
+
+    def reset(self):
+        """Starts a new stream, the zeros stand in for the input before the first sample"""
+        self.buffer = np.zeros(RESAMPLE_HALF_TAPS, dtype=np.float32)
+        self.buffer_start = 0  # index of buffer[0] in the zero padded input stream
+        self.produced = 0  # outputs returned so far
+
+    def process(self, samples):
+        """Outputs for float32 mono ``samples`` as far as the input allows, the rest comes with the next block"""
+        if self.from_rate == self.to_rate:
+            return samples
+        half = RESAMPLE_HALF_TAPS
+        buffer = np.concatenate((self.buffer, samples))
+        available = self.buffer_start + len(buffer)
+        # output k reads padded input [k * down // up + 1, + 2 * half)
+        end = max(((available - 2 * half) * self.up - 1) // self.down + 1, self.produced)
+        n_out = end - self.produced
+        if n_out == 0:
+            self.buffer = buffer  # a short block (the end of a capture) may not complete an output window
+            return np.empty(0, dtype=np.float32)
+        out = np.empty(n_out, dtype=np.float32)
+        windows = sliding_window_view(buffer, 2 * half)
+
+        if self.exact:
+            for phase in range(min(self.up, n_out)):
+                k = self.produced + phase
+                first = k * self.down // self.up + 1 - self.buffer_start
+                count = len(range(phase, n_out, self.up))
+                out[phase::self.up] = windows[first:first + count * self.down:self.down] @ self.table[k % self.up]
+        else:
+            for start in range(0, n_out, RESAMPLE_BLOCK):
+                k = self.produced + np.arange(start, min(start + RESAMPLE_BLOCK, n_out), dtype=np.int64)
+                firsts = k * self.down // self.up + 1 - self.buffer_start
+                phases = np.rint((k * self.down % self.up) / self.up * RESAMPLE_PHASES).astype(np.int64)
+                np.einsum('ij,ij->i', windows[firsts], self.table[phases], out=out[start:start + len(k)])
+
+        # keep from the first input sample the next output needs
+        self.produced = end
+        keep = end * self.down // self.up + 1 - self.buffer_start
+        self.buffer = buffer[keep:].copy()
+        self.buffer_start += keep
+        return out
+
+    def flush(self):
+        """The outputs still held back for lack of following input, then starts a new stream"""
+        if self.from_rate == self.to_rate:
+            return np.empty(0, dtype=np.float32)
+        out = self.process(np.zeros(RESAMPLE_HALF_TAPS, dtype=np.float32))
+        self.reset()
+        return out
+
+class StreamConverter:
+    """Interleaved int16 PCM blocks -> float32 mono at MODEL_SAMPLE_RATE, with the resampler state carried over"""
+    def __init__(self, sample_rate, channels):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.resampler = Resampler(sample_rate)
+
+    def process(self, pcm):
+        return self.resampler.process(downmix(pcm, self.channels))
+
+    def flush(self):
+        return self.resampler.flush()
+
+    def reset(self):
+        self.resampler.reset()
+
+def to_int16(samples):
+    return np.clip(samples * 32768, -32768, 32767).astype(np.int16)
+
+class ModelRateReader:
+    """
+    CaptureReader adapter delivering int16 mono at MODEL_SAMPLE_RATE.
+
+    Sits right after capture, so the phrase segmenter looks at a sixth of the data (48KHz stereo) and what it
+    passes on is already at the model's rate, each captured sample is downmixed and resampled once.
+    """
+    def __init__(self, reader):
+        self.reader = reader
+        self.engine = reader.engine
+        self.sample_rate = MODEL_SAMPLE_RATE
+        self.channels = 1
+        self.chunk = max(reader.chunk * MODEL_SAMPLE_RATE // reader.sample_rate, 1)
+        self.converter = StreamConverter(reader.sample_rate, reader.channels)
+        self.pending = np.empty(0, dtype=np.int16)
+
+    def position(self):
+        """Capture frame (at the capture's rate) the next read starts at"""
+        return self.reader.position() - len(self.pending) * self.reader.sample_rate / MODEL_SAMPLE_RATE
+
+    def read(self, frames):
+        """``frames`` int16 mono samples, fewer at the end of the capture, None once it's drained"""
+        parts = [self.pending]
+        have = len(self.pending)
+        while have < frames:
+            samples = self.reader.read(self.reader.chunk)
+            converted = to_int16(self.converter.flush() if samples is None else self.converter.process(samples))
+            parts.append(converted)
+            have += len(converted)
+            if samples is None:
+                break
+        pending = np.concatenate(parts) if len(parts) > 1 else self.pending
+        if len(pending) == 0:
+            return None
+        self.pending = pending[frames:]
+        return pending[:frames]
+
+def to_model_input(pcm, sample_rate, channels):
+    """Interleaved int16 PCM to float32 mono at MODEL_SAMPLE_RATE, ready for ``model.transcribe``"""
+    converter = StreamConverter(sample_rate, channels)
+    return np.concatenate((converter.process(pcm), converter.flush()))
@@ -1,11 +1,30 @@
+import threading
 import custom_speech_recognition as sr
-import pyaudiowpatch as pyaudio
 from datetime import datetime
+from StartupProfiler import profiler
+from AudioConversion import ModelRateReader
+try:
+    import pyaudiowpatch as pyaudio
+except ImportError:  # Windows only, for the loopback device lookup
+    pyaudio = None
 
 RECORD_TIMEOUT = 3
 ENERGY_THRESHOLD = 1000
 DYNAMIC_ENERGY_THRESHOLD = False
 
+def get_default_loopback_device(p):
+    """Device info of the WASAPI loopback device of the default speakers, None if there isn't one"""
+    with profiler.phase("device enumeration"):
+        wasapi_info = p.get_host_api_info_by_type(pyaudio.paWASAPI)
+        default_speakers = p.get_device_info_by_index(wasapi_info["defaultOutputDevice"])
+
+        if not default_speakers["isLoopbackDevice"]:
+            for loopback in p.get_loopback_device_info_generator():
+                if default_speakers["name"] in loopback["name"]:
+                    return loopback
+            return None
+        return default_speakers
+
 class BaseRecorder:
     def __init__(self, source, source_name):
         self.recorder = sr.Recognizer()
@@ -17,43 +36,101 @@ class BaseRecorder:
 
         self.source = source
         self.source_name = source_name
+        self.stop_listening = None
+        self.finished = threading.Event()  # set once a finite source (file, pipe) is drained
 
     def adjust_for_noise(self, device_name, msg):
         print(f"[INFO] Adjusting for ambient noise from {device_name}. " + msg)
-        with self.source:
+        with profiler.phase("ambient noise calibration"), self.source:
             self.recorder.adjust_for_ambient_noise(self.source)
         print(f"[INFO] Completed ambient noise adjustment for {device_name}.")
 
+    def chunk_time(self):
+        """When the chunk just recorded ended, on the capture's clock for a CaptureSource"""
+        return self.source.now() if isinstance(self.source, CaptureSource) else datetime.utcnow()
+
     def record_into_queue(self, audio_queue, pause_transcribe):
         def record_callback(_, audio:sr.AudioData) -> None:
             data = audio.get_raw_data()
-            audio_queue.put((self.source_name, data, datetime.utcnow()))
+            # hidden transcript, nothing to queue up for when it's shown again
+            if data and not pause_transcribe.is_set():
+                audio_queue.put((self.source_name, data, self.chunk_time()))
+            if getattr(self.source, "ended", False):
+                # listen returns empty audio at once from a drained source, stop instead of spinning
+                self.stop_listening(wait_for_stop=False)
+                self.finished.set()
 
-        self.recorder.listen_in_background(self.source, record_callback, pause_transcribe, phrase_time_limit=RECORD_TIMEOUT)
+        self.stop_listening = self.recorder.listen_in_background(self.source, record_callback,
+                                                                 phrase_time_limit=RECORD_TIMEOUT)
 
 class DefaultMicRecorder(BaseRecorder):
     def __init__(self):
         super().__init__(source=sr.Microphone(sample_rate=16000), source_name="You")
         self.adjust_for_noise("Default Mic", "Please make some noise from the Default Mic...")
 
+class CaptureSource(sr.AudioSource):
+    """
+    speech_recognition audio source reading from a CaptureEngine reader (or an adapter such as
+    AudioConversion.ModelRateReader) instead of opening the device again
+    """
+    def __init__(self, reader):
+        self.reader = reader
+        self.SAMPLE_RATE = reader.sample_rate
+        self.SAMPLE_WIDTH = 2  # int16
+        self.CHUNK = reader.chunk
+        self.channels = reader.channels
+        self.stream = self
+        self.ended = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def now(self):
+        """
+        Capture time of the audio read so far, so phrase timeouts and lag also hold for replays faster than
+        real time
+        """
+        return self.reader.engine.capture_time(self.reader.position())
+
+    def latest(self):
+        """
+        Capture time of the newest captured audio, what the transcriber measures its lag against. A lossless
+        capture (replay) waits for its readers instead, there's nothing to fall behind and skip ahead to
+        """
+        if self.reader.engine.lossless:
+            return self.now()
+        return self.reader.engine.capture_time(self.reader.engine.written)
+
+    def read(self, size):
+        samples = self.reader.read(size)
+        if samples is None:
+            self.ended = True
+            return b""
+        return samples.tobytes()
+
 class DefaultSpeakerRecorder(BaseRecorder):
-    def __init__(self):
-        with pyaudio.PyAudio() as p:
-            wasapi_info = p.get_host_api_info_by_type(pyaudio.paWASAPI)
-            default_speakers = p.get_device_info_by_index(wasapi_info["defaultOutputDevice"])
-            
-            if not default_speakers["isLoopbackDevice"]:
-                for loopback in p.get_loopback_device_info_generator():
-                    if default_speakers["name"] in loopback["name"]:
-                        default_speakers = loopback
-                        break
-                else:
-                    print("[ERROR] No loopback device found.")
-        
-        source = sr.Microphone(speaker=True,
-                               device_index= default_speakers["index"],
-                               sample_rate=int(default_speakers["defaultSampleRate"]),
-                               chunk_size=pyaudio.get_sample_size(pyaudio.paInt16),
-                               channels=default_speakers["maxInputChannels"])
-        super().__init__(source=source, source_name="Speaker")
-        self.adjust_for_noise("Default Speaker", "Please make or play some noise from the Default Speaker...")
\ No newline at end of file
+    def __init__(self, capture_reader):
+        # a reader of the EQ's capture engine, the device is only read once, converted to the model's 16KHz
+        # mono right away so phrases come out ready for Whisper
+        reader = ModelRateReader(capture_reader)
+        super().__init__(source=CaptureSource(reader), source_name="Speaker")
+        self.adjust_for_noise("Default Speaker", "Please make or play some noise from the Default Speaker...")
+
+def open_recorders(capture_reader, mic=False):
+    """Calibrated recorders of the speakers' capture and, with ``mic``, of the default microphone if it opens"""
+    recorders = [DefaultSpeakerRecorder(capture_reader)]
+    if mic:
+        try:
+            recorders.append(DefaultMicRecorder())
+        except Exception as e:
+            print(f"[ERROR] Microphone unavailable: {e}")
+    return recorders
+
+def start_recording(recorders, transcriber, audio_queue, pause_transcribe):
+    """Registers each recorder's source with the transcriber and starts its listener thread on the shared queue"""
+    for recorder in recorders:
+        transcriber.add_source(recorder.source_name, recorder.source)
+        recorder.record_into_queue(audio_queue, pause_transcribe)
@@ -1,102 +1,300 @@
-import whisper
-import torch
-import wave
-import os
 import threading
-import tempfile
-import custom_speech_recognition as sr
-import io
-from datetime import timedelta
-import pyaudiowpatch as pyaudio
+import queue
+from datetime import datetime, timedelta
 from heapq import merge
-import time
+from collections import deque
+import itertools
+import numpy as np
+from AudioConversion import StreamConverter, MODEL_SAMPLE_RATE
+from PhraseBuffer import PhraseBuffer
+from LocalAgreement import LocalAgreement
 
 PHRASE_TIMEOUT = 3.05
+PHRASE_HORIZON = 20  # seconds of audio a phrase buffers at most before its transcribed start is committed
+HORIZON_TAIL = 3  # seconds kept when a phrase over the horizon has no text to commit (music), about one chunk
+MAX_LAG = 10  # seconds transcription may fall behind the capture before the lag policy kicks in
+LAG_POLICIES = ("skip", "fast", "drop-silence")
+SILENCE_RMS = 300  # int16 RMS below which a chunk counts as silence for the drop-silence policy
 
 MAX_PHRASES = 10
 
+def rms(data):
+    samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+    return float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+
+def add_arguments(parser):
+    parser.add_argument('--horizon', type=float, default=PHRASE_HORIZON, metavar='SECONDS',
+                        help=f"most audio a phrase buffers before its start is committed (default {PHRASE_HORIZON}, "
+                             "0 = unbounded)")
+    parser.add_argument('--streaming', action='store_true',
+                        help="commit words once two passes agree and only re-decode the audio after them")
+    parser.add_argument('--mic', action='store_true', help="also transcribe the default microphone, as \"You\"")
+    parser.add_argument('--max-lag', type=float, default=MAX_LAG, metavar='SECONDS',
+                        help="how far transcription may fall behind the audio before --lag-policy applies "
+                             f"(default {MAX_LAG}, 0 = never)")
+    parser.add_argument('--lag-policy', choices=LAG_POLICIES, default=LAG_POLICIES[0],
+                        help="when lagging: skip to recent audio (default), decode with less effort or drop silence")
+
+def options_from_args(args):
+    """AudioTranscriber keyword arguments from the flags of add_arguments, --mic is for the recorders"""
+    return dict(horizon=args.horizon, streaming=args.streaming, max_lag=args.max_lag, lag_policy=args.lag_policy)
+
 class AudioTranscriber:
-    def __init__(self, speaker_source, model):
-        self.transcript_data = {"Speaker": []}
+    """
+    Transcribes the phrases of any number of sources with one shared model.
+
+    Sources are registered with ``add_source`` (also while the worker runs), their recorders share one audio
+    queue. The worker takes everything queued at once and gives each source one pass per batch, in the order
+    their oldest chunks were captured, so a busy source can't starve a quiet one. Transcript entries keep the
+    capture time their phrase started at, ``get_transcript`` and the views order the sources' phrases by it.
+    """
+    def __init__(self, model, horizon=PHRASE_HORIZON, streaming=False, max_lag=MAX_LAG, lag_policy=LAG_POLICIES[0]):
+        # None / 0 keeps whole phrases until a pause, however long (the buffer and each pass grow with it)
+        self.horizon_samples = int(horizon * MODEL_SAMPLE_RATE) if horizon else None
+        # streaming passes decode only the audio after the committed words, see transcribe_streaming
+        self.streaming = streaming
+        if lag_policy not in LAG_POLICIES:
+            raise ValueError(f"unknown lag policy {lag_policy!r}, expected one of {', '.join(LAG_POLICIES)}")
+        self.max_lag = max_lag  # None / 0 never applies the lag policy
+        self.lag_policy = lag_policy
+        self.lag = 0.0  # seconds the oldest chunk of the last batch was behind the newest audio of its source
+        self.skipped_chunks = 0
+        self.transcript_data = {}
         self.transcript_changed_event = threading.Event()
+        # ("set", phrase_id, text, source, phrase start) / ("remove", phrase_id) / ("clear",) for views that
+        # apply only what changed
+        self.transcript_changes = deque()
+        self.phrase_ids = itertools.count()
         self.audio_model = model
-        self.audio_sources = {
-            "Speaker": {
-                "sample_rate": speaker_source.SAMPLE_RATE,
-                "sample_width": speaker_source.SAMPLE_WIDTH,
-                "channels": speaker_source.channels,
-                "last_sample": bytes(),
-                "last_spoken": None,
-                "new_phrase": True,
-                "process_data_func": self.process_speaker_data
-            }
+        self.audio_sources = {}
+
+    def add_source(self, name, source):
+        """Transcribes the chunks queued as ``name``, ``source`` is the recorder's speech_recognition source"""
+        self.audio_sources[name] = {
+            "sample_rate": source.SAMPLE_RATE,
+            "sample_width": source.SAMPLE_WIDTH,
+            "channels": source.channels,
+            # phrase so far as float32 16KHz mono, each chunk is converted once when it arrives
+            "last_sample": PhraseBuffer(),
+            "converter": StreamConverter(source.SAMPLE_RATE, source.channels),
+            "last_spoken": None,
+            "new_phrase": True,
+            # capture time last_sample starts at, transcript entries are placed by when their audio started
+            "started": None,
+            # streaming: committed / tentative words of the phrase
+            "agreement": LocalAgreement(),
+            "offset": 0.0,  # seconds into the phrase last_sample starts at
+            # time of the newest captured audio, on the capture's clock where the source has one
+            "latest": getattr(source, "latest", datetime.utcnow)
         }
+        self.transcript_data[name] = []
 
     def transcribe_audio_queue(self, audio_queue, pause_transcribe):
         while True:
-            while pause_transcribe.is_set():
-                time.sleep(2)
-
-            who_spoke, data, time_spoken = audio_queue.get()
-            self.update_last_sample_and_phrase_status(who_spoke, data, time_spoken)
-            source_info = self.audio_sources[who_spoke]
+            pause_transcribe.wait_resumed()
 
-            text = ''
+            # chunks that queued up during the last pass are transcribed together, one pass per source
+            batch = [audio_queue.get()]
+            while True:
+                try:
+                    batch.append(audio_queue.get_nowait())
+                except queue.Empty:
+                    break
             try:
-                fd, path = tempfile.mkstemp(suffix=".wav")
-                os.close(fd)
-                source_info["process_data_func"](source_info["last_sample"], path)
-                text = self.audio_model.get_transcription(path)
+                self.transcribe_batch(batch)
             except Exception as e:
-                print(e)
+                # one bad pass mustn't end transcription for the session
+                print(f"[ERROR] Transcription failed: {e}")
             finally:
-                os.unlink(path)
+                for _ in range(len(batch)):
+                    audio_queue.task_done()  # lets audio_queue.join() wait for the backlog to be transcribed
 
-            if text != '' and text.lower() != 'you':
-                self.update_transcript(who_spoke, text, time_spoken)
-                self.transcript_changed_event.set()
+    def transcribe_batch(self, batch):
+        """One pass per source over the chunks (source, data, capture time) taken from the queue at once"""
+        batch = [chunk for chunk in batch if chunk[0] in self.audio_sources]
+        now = {}
+        for who_spoke, _, _ in batch:
+            now.setdefault(who_spoke, self.audio_sources[who_spoke]["latest"]())
+        self.lag = max([(now[who_spoke] - time_spoken).total_seconds() for who_spoke, _, time_spoken in batch],
+                       default=0.0)
+        fast = False
+        if self.max_lag and self.lag > self.max_lag:
+            batch, fast = self.apply_lag_policy(batch, now)
 
-    def update_last_sample_and_phrase_status(self, who_spoke, data, time_spoken):
+        pending = {}  # one pass per source, in the order of their oldest chunk in the batch
+        for who_spoke, data, time_spoken in batch:
+            if who_spoke in pending and self.phrase_timed_out(who_spoke, time_spoken):
+                # the batch ends this phrase, transcribe it before its audio is cleared
+                self.transcribe(who_spoke, fast)
+                pending.pop(who_spoke)
+            self.update_last_sample_and_phrase_status(who_spoke, data, time_spoken)
+            pending.setdefault(who_spoke)
+        for who_spoke in pending:
+            self.transcribe(who_spoke, fast)
+
+    def apply_lag_policy(self, batch, now):
+        """The chunks of a batch to transcribe when lagging more than max_lag, and whether to decode fast"""
+        if self.lag_policy == "fast":
+            return batch, True
+        if self.lag_policy == "drop-silence":
+            kept = [chunk for chunk in batch if rms(chunk[1]) >= SILENCE_RMS]
+            self.skipped_chunks += len(batch) - len(kept)
+            return kept, False
+        # skip ahead to the chunks within max_lag of their source's newest audio, the phrases the skipped ones
+        # belong to end there
+        kept, skipped = [], []
+        for chunk in batch:
+            (kept if (now[chunk[0]] - chunk[2]).total_seconds() <= self.max_lag else skipped).append(chunk)
+        if not kept:
+            kept, skipped = skipped[-1:], skipped[:-1]
+        for who_spoke in {chunk[0] for chunk in skipped}:
+            self.reset_phrase(self.audio_sources[who_spoke])
+        self.skipped_chunks += len(skipped)
+        return kept, False
+
+    def transcribe(self, who_spoke, fast=False):
+        if self.streaming:
+            self.transcribe_streaming(who_spoke, fast)
+            return
+        source_info = self.audio_sources[who_spoke]
+
+        # already float32 16KHz mono, straight to the model, no temp WAV file for ffmpeg to decode
+        segments = self.audio_model.get_segments(source_info["last_sample"].view(), fast=fast)
+        text = "".join(segment[2] for segment in segments).strip()
+
+        usable = text != '' and text.lower() != 'you'
+        if usable:
+            self.update_transcript(who_spoke, text, source_info["started"])
+            self.transcript_changed_event.set()
+        phrase = source_info["last_sample"]
+        if self.horizon_samples and len(phrase) > self.horizon_samples:
+            if usable:
+                self.slide_window(who_spoke, segments)
+            else:
+                # nothing to commit, still keep the buffer and each pass bounded
+                keep = min(HORIZON_TAIL * MODEL_SAMPLE_RATE, self.horizon_samples)
+                self.drop_audio(source_info, len(phrase) - keep)
+
+    def transcribe_streaming(self, who_spoke, fast=False):
+        # local agreement: words two passes in a row agree on are committed and their audio dropped, so each
+        # pass only decodes the uncommitted tail, with the committed text as the prompt instead of as audio
         source_info = self.audio_sources[who_spoke]
-        if source_info["last_spoken"] and time_spoken - source_info["last_spoken"] > timedelta(seconds=PHRASE_TIMEOUT):
-            source_info["last_sample"] = bytes()
+        phrase, agreement = source_info["last_sample"], source_info["agreement"]
+        words = self.audio_model.get_words(phrase.view(), agreement.prompt(), fast=fast)
+        agreement.insert(words, source_info["offset"])
+        drop = 0
+        if self.horizon_samples and len(phrase) > self.horizon_samples:
+            # no agreement for a whole horizon (or no words at all), keep the buffer bounded anyway
+            agreement.force()
+            drop = len(phrase) - self.horizon_samples
+
+        drop = max(drop, int((agreement.committed_end - source_info["offset"]) * MODEL_SAMPLE_RATE))
+        self.drop_audio(source_info, drop)
+
+        def started(words):
+            # capture time of the first word, word times count from the start of the phrase
+            first = words[0][0] - source_info["offset"] if words else 0.0
+            return source_info["started"] + timedelta(seconds=first)
+
+        # committed sentences (or a horizon's worth) become a finished phrase, like slide_window's segments
+        finished_start = started(agreement.committed)
+        finished = agreement.finalize(self.horizon_samples / MODEL_SAMPLE_RATE if self.horizon_samples else None)
+        if finished:
+            self.update_transcript(who_spoke, finished, finished_start)
             source_info["new_phrase"] = True
+            self.transcript_changed_event.set()
+
+        text = agreement.text()
+        if text != '' and text.lower() != 'you':
+            self.update_transcript(who_spoke, text, started(agreement.committed + agreement.tentative))
+            self.transcript_changed_event.set()
+
+    def slide_window(self, who_spoke, segments):
+        # continuous audio never pauses long enough to end the phrase: keep all but the last segment as a
+        # finished phrase and drop its audio, the last one may still be cut off and continues as a new phrase
+        source_info = self.audio_sources[who_spoke]
+        phrase = source_info["last_sample"]
+        if len(segments) > 1:
+            committed, tail = segments[:-1], segments[-1:]
+            keep_from = int(tail[0][0] * MODEL_SAMPLE_RATE)
         else:
-            source_info["new_phrase"] = False
+            committed, tail = segments, []
+            keep_from = len(phrase)
+        self.update_transcript(who_spoke, "".join(segment[2] for segment in committed).strip(), source_info["started"])
+        self.drop_audio(source_info, keep_from)
+        source_info["new_phrase"] = True
+        tail_text = "".join(segment[2] for segment in tail).strip()
+        if tail_text:
+            self.update_transcript(who_spoke, tail_text, source_info["started"])
 
-        source_info["last_sample"] += data
+    def drop_audio(self, source_info, count):
+        """Drops the phrase's oldest ``count`` samples, where it starts moves along"""
+        count = min(max(count, 0), len(source_info["last_sample"]))
+        source_info["last_sample"].drop_front(count)
+        source_info["started"] += timedelta(seconds=count / MODEL_SAMPLE_RATE)
+        source_info["offset"] += count / MODEL_SAMPLE_RATE
+
+    def update_last_sample_and_phrase_status(self, who_spoke, data, time_spoken):
+        source_info = self.audio_sources[who_spoke]
+        if self.phrase_timed_out(who_spoke, time_spoken):
+            self.reset_phrase(source_info)
+
+        if len(source_info["last_sample"]) == 0:
+            # chunks are queued with the time they ended at
+            bytes_per_second = source_info["sample_rate"] * source_info["sample_width"] * source_info["channels"]
+            source_info["started"] = time_spoken - timedelta(seconds=len(data) / bytes_per_second)
+        source_info["last_sample"].append(source_info["converter"].process(data))
         source_info["last_spoken"] = time_spoken 
 
-    def process_speaker_data(self, data, temp_file_name):
-        with wave.open(temp_file_name, 'wb') as wf:
-            wf.setnchannels(self.audio_sources["Speaker"]["channels"])
-            p = pyaudio.PyAudio()
-            wf.setsampwidth(p.get_sample_size(pyaudio.paInt16))
-            wf.setframerate(self.audio_sources["Speaker"]["sample_rate"])
-            wf.writeframes(data)
+    def phrase_timed_out(self, who_spoke, time_spoken):
+        last_spoken = self.audio_sources[who_spoke]["last_spoken"]
+        return last_spoken is not None and time_spoken - last_spoken > timedelta(seconds=PHRASE_TIMEOUT)
 
-    def update_transcript(self, who_spoke, text, time_spoken):
+    def update_transcript(self, who_spoke, text, started):
         source_info = self.audio_sources[who_spoke]
         transcript = self.transcript_data[who_spoke]
+        if len(self.audio_sources) > 1:
+            text = f"{who_spoke}: {text}"
 
         if source_info["new_phrase"] or len(transcript) == 0:
             if len(transcript) > MAX_PHRASES:
-                transcript.pop(-1)
-            transcript.insert(0, (f"{text}\n\n", time_spoken))
+                _, _, removed_id = transcript.pop(-1)
+                self.transcript_changes.append(("remove", removed_id))
+            transcript.insert(0, (f"{text}\n\n", started, next(self.phrase_ids)))
+            # stays set until the phrase has text, a first chunk without any doesn't overwrite the last phrase
+            source_info["new_phrase"] = False
         else:
-            transcript[0] = (f"{text}\n\n", time_spoken)
+            # the phrase keeps its start time, so it stays in place among the other sources' phrases
+            transcript[0] = (f"{text}\n\n", transcript[0][1], transcript[0][2])
+        text, started, phrase_id = transcript[0]
+        self.transcript_changes.append(("set", phrase_id, text, who_spoke, started))
 
     def get_transcript(self):
-        combined_transcript = list(merge(
-            self.transcript_data["Speaker"], 
-            key=lambda x: x[1]))
+        """The latest MAX_PHRASES phrases of all sources, oldest first"""
+        # each source's phrases are newest first
+        combined_transcript = list(merge(*[list(transcript) for transcript in list(self.transcript_data.values())],
+                                         key=lambda x: x[1], reverse=True))[:MAX_PHRASES]
         combined_transcript.reverse()
-        combined_transcript = combined_transcript[:MAX_PHRASES]
         return "".join([t[0] for t in combined_transcript])
-    
+
+    def pop_transcript_changes(self):
+        """Returns the transcript changes since the last call, oldest first"""
+        changes = []
+        while self.transcript_changes:
+            changes.append(self.transcript_changes.popleft())
+        return changes
+
     def clear_transcript_data(self):
-        self.transcript_data["Speaker"].clear()
+        for transcript in self.transcript_data.values():
+            transcript.clear()
+        self.transcript_changes.append(("clear",))
 
-        self.audio_sources["Speaker"]["last_sample"] = bytes()
+        for source_info in self.audio_sources.values():
+            self.reset_phrase(source_info)
 
-        self.audio_sources["Speaker"]["new_phrase"] = True
\ No newline at end of file
+    def reset_phrase(self, source_info):
+        source_info["last_sample"].clear()
+        source_info["converter"].reset()
+        source_info["agreement"].reset()
+        source_info["offset"] = 0.0
+        source_info["new_phrase"] = True
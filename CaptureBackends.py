@@ -0,0 +1,206 @@
+"""
+Capture backends for CaptureEngine.
+
+A backend has ``sample_rate``, ``channels``, ``read(frames) -> bytes`` of interleaved int16 frames (empty once
+the source is exhausted), ``close()`` and ``live``: whether it runs on a clock of its own that can't wait for
+slow readers (a device, realtime-paced replay). Besides the WASAPI loopback device there are file replay,
+synthetic and raw PCM pipe backends, so the EQ and transcription pipeline can run and be benchmarked without
+Windows.
+"""
+import io
+import subprocess
+import sys
+import time
+import wave
+import numpy as np
+from StartupProfiler import profiler
+
+SYNTHETIC_SAMPLE_RATE = 48000
+SYNTHETIC_CHANNELS = 2
+SYNTHETIC_AMPLITUDE = 0.3  # of int16 full scale
+
+class Pacer:
+    """Sleeps so frames come out at ``sample_rate`` like a live device, or doesn't if ``realtime`` is False"""
+    def __init__(self, sample_rate, realtime=True):
+        self.sample_rate = sample_rate
+        self.realtime = realtime
+        self.start = None
+        self.frames = 0
+
+    def wait(self, frames):
+        if not self.realtime:
+            return
+        if self.start is None:
+            self.start = time.perf_counter()
+        self.frames += frames
+        delay = self.start + self.frames / self.sample_rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+class LoopbackBackend:
+    """WASAPI loopback device of the default speakers, needs pyaudiowpatch (Windows)"""
+    live = True
+
+    def __init__(self, chunk=1024):
+        with profiler.phase("import pyaudiowpatch"):
+            import pyaudiowpatch as pyaudio
+        import AudioRecorder
+
+        with profiler.phase("pyaudio init"):
+            self.p = pyaudio.PyAudio()
+        device = AudioRecorder.get_default_loopback_device(self.p)
+        if device is None:
+            self.p.terminate()
+            raise RuntimeError("No loopback device found")
+        self.sample_rate = int(device["defaultSampleRate"])
+        self.channels = device["maxInputChannels"]
+        self.stream = self.p.open(
+            format=pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.sample_rate,
+            frames_per_buffer=chunk,
+            input=True,
+            input_device_index=device["index"]
+        )
+
+    def read(self, frames):
+        return self.stream.read(frames, exception_on_overflow=False)
+
+    def close(self):
+        self.stream.stop_stream()
+        self.stream.close()
+        self.p.terminate()
+
+class FileBackend:
+    """
+    Replays a WAV or FLAC file, paced like a live device or as fast as possible with ``realtime=False``.
+
+    FLAC is decoded to WAV with the flac converter speech_recognition already bundles. 8, 24 and 32 bit
+    samples are converted to int16.
+    """
+    def __init__(self, path, realtime=True, loop=False):
+        if path.lower().endswith(".flac"):
+            from custom_speech_recognition.audio import get_flac_converter
+            decoded = subprocess.run([get_flac_converter(), "--decode", "--stdout", "--totally-silent", path],
+                                     stdout=subprocess.PIPE, check=True).stdout
+            self.wav = wave.open(io.BytesIO(decoded), 'rb')
+        else:
+            self.wav = wave.open(path, 'rb')
+        self.sample_rate = self.wav.getframerate()
+        self.channels = self.wav.getnchannels()
+        self.sample_width = self.wav.getsampwidth()
+        self.loop = loop
+        self.live = realtime
+        self.pacer = Pacer(self.sample_rate, realtime)
+
+    def read(self, frames):
+        data = self.wav.readframes(frames)
+        if not data and self.loop:
+            self.wav.rewind()
+            data = self.wav.readframes(frames)
+        self.pacer.wait(len(data) // (self.sample_width * self.channels))
+        return to_int16(data, self.sample_width)
+
+    def close(self):
+        self.wav.close()
+
+def to_int16(data, sample_width):
+    if sample_width == 2 or not data:
+        return data
+    if sample_width == 1:  # unsigned
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif sample_width == 3:
+        # top two bytes of each little-endian 24 bit sample
+        samples = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)[:, 1:].copy().view(np.int16)
+    else:
+        samples = (np.frombuffer(data, dtype=np.int32) >> 16).astype(np.int16)
+    return samples.tobytes()
+
+class SyntheticBackend:
+    """
+    Generated test signal: a sum of sine tones, white noise if ``frequencies`` is empty. Runs forever or for
+    ``duration`` seconds, paced like a live device unless ``realtime`` is False.
+    """
+    def __init__(self, frequencies=(440.0,), sample_rate=SYNTHETIC_SAMPLE_RATE, channels=SYNTHETIC_CHANNELS,
+                 amplitude=SYNTHETIC_AMPLITUDE, duration=None, realtime=True, seed=0):
+        self.frequencies = np.asarray(frequencies, dtype=np.float64)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.amplitude = amplitude * np.iinfo(np.int16).max
+        self.total_frames = None if duration is None else int(duration * sample_rate)
+        self.position = 0
+        self.rng = np.random.default_rng(seed)
+        self.live = realtime
+        self.pacer = Pacer(sample_rate, realtime)
+
+    def read(self, frames):
+        if self.total_frames is not None:
+            frames = min(frames, self.total_frames - self.position)
+            if frames <= 0:
+                return b""
+        if len(self.frequencies):
+            t = (self.position + np.arange(frames)) / self.sample_rate
+            signal = np.sin(2 * np.pi * self.frequencies[:, None] * t).sum(axis=0) / len(self.frequencies)
+        else:
+            signal = self.rng.uniform(-1, 1, frames)
+        self.position += frames
+        self.pacer.wait(frames)
+        samples = np.repeat((signal * self.amplitude).astype(np.int16), self.channels)
+        return samples.tobytes()
+
+    def close(self):
+        pass
+
+class PipeBackend:
+    """
+    Raw interleaved int16 little-endian PCM from stdin ("-") or a file / FIFO, e.g. from
+    ``ffmpeg -i song.mp3 -f s16le -ac 2 -ar 48000 -``. The producer sets the pace.
+    """
+    live = False
+
+    def __init__(self, path="-", sample_rate=SYNTHETIC_SAMPLE_RATE, channels=SYNTHETIC_CHANNELS):
+        self.file = sys.stdin.buffer if path == "-" else open(path, 'rb')
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_size = 2 * channels
+
+    def read(self, frames):
+        data = self.file.read(frames * self.frame_size)
+        # drop a trailing partial frame at the end of the stream
+        return data[:len(data) - len(data) % self.frame_size]
+
+    def close(self):
+        if self.file is not sys.stdin.buffer:
+            self.file.close()
+
+def open_backend(spec, chunk=1024, sample_rate=None, channels=None, realtime=True, loop=False):
+    """
+    Backend from a command line spec: ``loopback``, ``file:PATH``, ``tone:FREQ[,FREQ...]``, ``noise`` or
+    ``pcm:PATH`` (``pcm:-`` for stdin). ``sample_rate`` / ``channels`` apply to synthetic and pcm sources.
+    """
+    kind, _, arg = spec.partition(":")
+    rate_channels = dict(sample_rate=sample_rate or SYNTHETIC_SAMPLE_RATE, channels=channels or SYNTHETIC_CHANNELS)
+    if kind == "loopback":
+        return LoopbackBackend(chunk)
+    if kind == "file":
+        return FileBackend(arg, realtime, loop)
+    if kind == "tone":
+        return SyntheticBackend([float(f) for f in (arg or "440").split(",")], realtime=realtime, **rate_channels)
+    if kind == "noise":
+        return SyntheticBackend((), realtime=realtime, **rate_channels)
+    if kind == "pcm":
+        return PipeBackend(arg or "-", **rate_channels)
+    raise ValueError(f"unknown capture source {spec!r}, expected loopback, file:PATH, tone:FREQ, noise or pcm:PATH")
+
+def add_arguments(parser):
+    parser.add_argument('--source', default='loopback',
+                        help="capture source: loopback, file:PATH (WAV/FLAC), tone:FREQ[,FREQ...], noise or pcm:PATH "
+                             "(raw int16, pcm:- for stdin)")
+    parser.add_argument('--source-rate', type=int, help="sample rate of tone / noise / pcm sources")
+    parser.add_argument('--source-channels', type=int, help="channels of tone / noise / pcm sources")
+    parser.add_argument('--no-realtime', action='store_true',
+                        help="replay files and generate signals as fast as possible instead of in real time")
+    parser.add_argument('--loop', action='store_true', help="replay file sources forever")
+
+def from_args(args, chunk=1024):
+    return open_backend(args.source, chunk, args.source_rate, args.source_channels, not args.no_realtime, args.loop)
@@ -0,0 +1,161 @@
+import threading
+import wave
+from datetime import datetime, timedelta
+import numpy as np
+
+RING_SECONDS = 10  # capture history kept for readers, a reader further behind than this loses audio
+SAMPLE_WIDTH = 2  # int16
+
+class CaptureEngine:
+    """
+    One capture thread feeding every consumer of the same audio source.
+
+    The thread reads ``chunk`` frames at a time from a backend (see CaptureBackends) and copies them into a
+    preallocated int16 ring buffer of interleaved samples. Consumers (EQ, phrase segmentation, a recorder)
+    each get a ``CaptureReader`` with its own cursor, so the device is opened and read once no matter how many
+    readers there are. An empty read ends the capture, readers then drain what is left and get None.
+
+    A live backend (a device) can't wait, so slow readers overrun. Other backends (file replay, pipes, synthetic
+    signals as fast as possible) are held back until every reader has room, nothing is lost.
+    """
+    def __init__(self, backend, chunk=1024, ring_seconds=RING_SECONDS):
+        self.backend = backend
+        self.sample_rate = backend.sample_rate
+        self.channels = backend.channels
+        self.chunk = chunk
+        # rounded up to whole chunks, a write (at most one chunk) wraps at most once
+        self.capacity = -(-int(ring_seconds * self.sample_rate) // chunk) * chunk
+        self.ring = np.zeros(self.capacity * self.channels, dtype=np.int16)
+        self.written = 0  # frames captured since start, readers' cursors count in the same frames
+        self.stopped = False
+        self.lossless = not backend.live
+        self.readers = []
+        self.condition = threading.Condition()
+        self.thread = None
+        self.start_time = None  # UTC wall clock time of the first frame
+
+    def start(self):
+        self.start_time = datetime.utcnow()
+        self.thread = threading.Thread(target=self.capture_thread, daemon=True)
+        self.thread.start()
+        return self
+
+    def capture_thread(self):
+        try:
+            while not self.stopped:
+                data = self.backend.read(self.chunk)
+                if not data:
+                    break
+                self.write(np.frombuffer(data, dtype=np.int16))
+        finally:
+            with self.condition:
+                self.stopped = True
+                self.condition.notify_all()
+
+    def write(self, samples):
+        frames = len(samples) // self.channels
+        with self.condition:
+            if self.lossless:
+                self.condition.wait_for(lambda: self.stopped or all(
+                    self.written + frames - reader.cursor <= self.capacity for reader in self.readers))
+            start = (self.written % self.capacity) * self.channels
+            first = min(len(samples), len(self.ring) - start)
+            self.ring[start:start + first] = samples[:first]
+            self.ring[:len(samples) - first] = samples[first:]
+            self.written += frames
+            self.condition.notify_all()
+
+    def capture_time(self, frame):
+        """UTC time of ``frame`` on the capture's own clock, runs ahead of the wall clock on fast replays"""
+        return self.start_time + timedelta(seconds=frame / self.sample_rate)
+
+    def reader(self, name):
+        reader = CaptureReader(self, name)
+        with self.condition:
+            self.readers.append(reader)
+        return reader
+
+    def record(self, path):
+        """Writes everything captured from now on to a WAV file, from its own reader thread"""
+        reader = self.reader("recorder")
+
+        def record_thread():
+            with wave.open(path, 'wb') as wf:
+                wf.setnchannels(self.channels)
+                wf.setsampwidth(SAMPLE_WIDTH)
+                wf.setframerate(self.sample_rate)
+                while (samples := reader.read(self.chunk)) is not None:
+                    wf.writeframes(samples.tobytes())
+
+        threading.Thread(target=record_thread, daemon=True).start()
+        return reader
+
+    def close(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.backend.close()
+
+class CaptureReader:
+    """
+    Independent cursor into a CaptureEngine's ring buffer.
+
+    ``read`` blocks until ``frames`` new frames are there and copies them out, into ``out`` if given, otherwise
+    into a buffer reused between calls. A reader that falls more than the ring's capacity behind has lost audio:
+    its cursor jumps to the oldest frame still in the ring, ``overruns`` counts how often that happened and
+    ``lost_frames`` how much was skipped.
+    """
+    def __init__(self, engine, name):
+        self.engine = engine
+        self.name = name
+        self.sample_rate = engine.sample_rate
+        self.channels = engine.channels
+        self.chunk = engine.chunk
+        self.cursor = engine.written
+        self.overruns = 0
+        self.lost_frames = 0
+        self._buffer = None
+
+    def close(self):
+        """Detaches the reader, a lossless engine stops waiting for it"""
+        with self.engine.condition:
+            self.engine.readers.remove(self)
+            self.engine.condition.notify_all()
+
+    def available(self):
+        return self.engine.written - self.cursor
+
+    def position(self):
+        """Capture frame the next read starts at"""
+        return self.cursor
+
+    def read(self, frames, out=None):
+        """``frames`` interleaved int16 frames, fewer at the end of the capture, None once it's drained"""
+        engine = self.engine
+        with engine.condition:
+            engine.condition.wait_for(lambda: engine.written - self.cursor >= frames or engine.stopped)
+            behind = engine.written - self.cursor
+            if behind > engine.capacity:
+                self.overruns += 1
+                self.lost_frames += behind - engine.capacity
+                self.cursor += behind - engine.capacity
+                behind = engine.capacity
+            frames = min(frames, behind)
+            if frames == 0:
+                return None
+
+            size = frames * engine.channels
+            if out is None:
+                if self._buffer is None or len(self._buffer) != size:
+                    self._buffer = np.empty(size, dtype=np.int16)
+                out = self._buffer
+            else:
+                out = out[:size]
+            start = (self.cursor % engine.capacity) * engine.channels
+            first = min(size, len(engine.ring) - start)
+            out[:first] = engine.ring[start:start + first]
+            out[first:] = engine.ring[:size - first]
+            self.cursor += frames
+            if engine.lossless:
+                engine.condition.notify_all()
+        return out
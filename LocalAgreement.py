@@ -0,0 +1,92 @@
+"""
+Local agreement policy for streaming transcription.
+
+Each pass transcribes only the audio after the committed words and yields a hypothesis, a list of timestamped
+words. Words that two consecutive passes agree on, from the start of the hypothesis, are stable: they are
+committed, their audio can be dropped and later passes get them as the decoder prompt instead of as audio.
+The rest of the latest hypothesis is tentative and may still change with the next chunk. ``finalize`` hands
+committed words over as a finished phrase, only the prompt's tail of them is kept after that.
+"""
+import re
+from collections import deque
+
+PROMPT_CHARS = 200  # committed text passed as the decoder prompt, whisper keeps about half its context for it
+OVERLAP_WORDS = 5  # longest repeat of the committed end a new hypothesis is checked for
+OVERLAP_SECONDS = 1.0  # how close to the committed end a hypothesis starts for a repeat to be looked for
+TIMESTAMP_SLACK = 0.1  # seconds a word may start before the committed end and still count as new
+SENTENCE_ENDS = (".", "?", "!")
+
+def normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+class LocalAgreement:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.committed = []  # (start, end, word) not finalized yet, seconds since the phrase started
+        self.tentative = []
+        self.committed_end = 0.0
+        self.recent = deque(maxlen=OVERLAP_WORDS)  # last committed words, finalized or not, for skip_overlap
+        self.context = ""  # committed text of the phrase, the last PROMPT_CHARS of it
+
+    def insert(self, words, offset):
+        """
+        Takes a pass's (start, end, word) with times relative to its audio, which starts ``offset`` seconds into
+        the phrase, and returns the words that got committed
+        """
+        words = [(start + offset, end + offset, word) for start, end, word in words
+                 if start + offset >= self.committed_end - TIMESTAMP_SLACK]
+        words = self.skip_overlap(words)
+
+        agreed = 0
+        for new, old in zip(words, self.tentative):
+            if normalize(new[2]) != normalize(old[2]):
+                break
+            agreed += 1
+        return self.commit(words[:agreed], words[agreed:])
+
+    def skip_overlap(self, words):
+        # the prompt makes whisper repeat the committed end now and then, drop that from the hypothesis
+        if not words or not self.recent or words[0][0] - self.committed_end > OVERLAP_SECONDS:
+            return words
+        recent = list(self.recent)
+        for n in range(min(len(words), len(recent)), 0, -1):
+            if [normalize(w[2]) for w in recent[-n:]] == [normalize(w[2]) for w in words[:n]]:
+                return words[n:]
+        return words
+
+    def commit(self, committed, tentative=()):
+        self.committed.extend(committed)
+        self.recent.extend(committed)
+        self.context = (self.context + "".join(word for _, _, word in committed))[-PROMPT_CHARS:]
+        self.tentative = list(tentative)
+        if committed:
+            self.committed_end = committed[-1][1]
+        return committed
+
+    def force(self, keep=1):
+        """Commits the tentative words but the last ``keep``, for when agreement takes too long"""
+        split = max(len(self.tentative) - keep, 0)
+        return self.commit(self.tentative[:split], self.tentative[split:])
+
+    def finalize(self, max_span=None):
+        """
+        Text of the committed words up to the last sentence end, or of all of them once they span more than
+        ``max_span`` seconds, which are then no longer part of ``text``. Empty if the phrase goes on.
+        """
+        ends = [i for i, (_, _, word) in enumerate(self.committed) if word.rstrip().endswith(SENTENCE_ENDS)]
+        if ends:
+            split = ends[-1] + 1
+        elif max_span and self.committed and self.committed[-1][1] - self.committed[0][0] > max_span:
+            split = len(self.committed)
+        else:
+            return ""
+        finished, self.committed = self.committed[:split], self.committed[split:]
+        return "".join(word for _, _, word in finished).strip()
+
+    def prompt(self):
+        return self.context.strip()
+
+    def text(self):
+        return "".join(word for _, _, word in self.committed + self.tentative).strip()
@@ -0,0 +1,95 @@
+import time
+import numpy as np
+from StartupProfiler import profiler
+with profiler.phase("import matplotlib"):
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+FRAME_TIME_SMOOTHING = 0.05  # weight of the newest frame in the running average frame time
+
+class BlitBarRenderer:
+    """
+    Matplotlib bar chart of the EQ levels and peak markers, redrawn with blitting.
+
+    Axes, ticks and labels are rendered once into a cached background (again whenever the canvas does a full
+    draw, e.g. on resize). Each frame restores that background, redraws only the animated bar and peak artists
+    and blits the figure area. With ``blit=False`` every frame is a full ``canvas.draw()`` as before, for
+    comparison. ``frame_time_ms`` is a running average of the measured draw time.
+    """
+    def __init__(self, master, n_bars, labels, n_sets, colors, background, ylim, peak_height,
+                 max_tick_labels=12, blit=True):
+        self.blit = blit
+        self.frame_time_ms = 0.0
+        self.frames = 0
+
+        # Modify plot look
+        self.fig, self.ax = plt.subplots()
+        self.fig.set_facecolor(background)
+        self.ax.set_facecolor(background)
+        for spine in self.ax.spines.values():
+            spine.set_visible(False)
+        self.ax.xaxis.set_ticks_position('none')
+        self.ax.tick_params(axis='x', rotation=45)
+        self.ax.get_yaxis().set_visible(False)
+        self.fig.subplots_adjust(left=0, right=1, top=1)
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.canvas_widget = self.canvas.get_tk_widget()
+
+        tick_step = -(-n_bars // max_tick_labels)
+        self.ax.set_xticks(list(range(0, n_bars, tick_step)))
+        self.ax.set_xticklabels(labels[::tick_step], color=colors[0])
+
+        # one bar set per channel set (left/right or mid/side sit side by side), thin bars float at the peaks
+        bar_positions = np.arange(n_bars)
+        bar_width = 0.8 / n_sets
+        self.bar_sets, self.peak_sets = [], []
+        for i in range(n_sets):
+            positions = bar_positions + (i - (n_sets - 1) / 2) * bar_width
+            self.bar_sets.append(self.ax.bar(positions, np.zeros(n_bars), width=bar_width,
+                                             color=colors[i], animated=blit))
+            self.peak_sets.append(self.ax.bar(positions, peak_height, width=bar_width,
+                                              color=colors[i], animated=blit))
+        self.ax.set_ylim(1, ylim)
+        self.artists = [artist for bars in self.bar_sets + self.peak_sets for artist in bars]
+
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    @property
+    def description(self):
+        return 'blit' if self.blit else 'full redraw'
+
+    def grid(self, **kwargs):
+        self.canvas_widget.grid(**kwargs)
+        self.canvas.draw()  # resolve rendering issues w 1 px white line on right
+
+    def on_draw(self, event):
+        # full redraws (first show, resize) refresh the cached background, animated artists aren't in it
+        if self.blit:
+            self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+            self.draw_artists()
+
+    def draw_artists(self):
+        for artist in self.artists:
+            self.ax.draw_artist(artist)
+
+    def draw(self, levels, peaks):
+        start = time.perf_counter()
+        for bars, amps in zip(self.bar_sets, levels):
+            for bar, amp in zip(bars, amps):
+                bar.set_height(amp)
+        for markers, amps in zip(self.peak_sets, peaks):
+            for marker, amp in zip(markers, amps):
+                marker.set_y(amp)
+
+        if not self.blit:
+            self.canvas.draw()
+        elif self.background is not None:
+            self.canvas.restore_region(self.background)
+            self.draw_artists()
+            self.canvas.blit(self.fig.bbox)
+
+        frame_ms = (time.perf_counter() - start) * 1000
+        self.frames += 1
+        self.frame_time_ms += (frame_ms - self.frame_time_ms) * (FRAME_TIME_SMOOTHING if self.frames > 1 else 1)
@@ -0,0 +1,22 @@
+import threading
+
+class PauseSignal:
+    """
+    Drop-in for the threading.Event the UI sets to pause transcription that can also be waited on until it's
+    cleared again, so a paused transcription worker sleeps until resumed instead of polling.
+    """
+    def __init__(self):
+        self.resumed = threading.Event()
+        self.resumed.set()
+
+    def set(self):
+        self.resumed.clear()
+
+    def clear(self):
+        self.resumed.set()
+
+    def is_set(self):
+        return not self.resumed.is_set()
+
+    def wait_resumed(self, timeout=None):
+        return self.resumed.wait(timeout)
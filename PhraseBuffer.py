@@ -0,0 +1,41 @@
+import numpy as np
+from AudioConversion import MODEL_SAMPLE_RATE
+
+INITIAL_SECONDS = 10  # initial capacity, long phrases double it
+
+class PhraseBuffer:
+    """
+    Growable preallocated sample buffer for the phrase being transcribed.
+
+    ``append`` copies only the new samples (capacity doubles when full, O(1) amortized) instead of recopying
+    the whole phrase like ``bytes +=``. ``view`` is a zero-copy view of the samples so far, valid until the
+    next ``clear`` or ``drop_front`` (appends never move samples a view already covers, growing copies them to
+    a new array and old views keep the old one). ``clear`` starts a new phrase and keeps the capacity,
+    ``drop_front`` discards the oldest samples of a sliding window.
+    """
+    def __init__(self, capacity=INITIAL_SECONDS * MODEL_SAMPLE_RATE, dtype=np.float32):
+        self.buffer = np.empty(capacity, dtype=dtype)
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, samples):
+        end = self.length + len(samples)
+        if end > len(self.buffer):
+            grown = np.empty(max(end, 2 * len(self.buffer)), dtype=self.buffer.dtype)
+            grown[:self.length] = self.buffer[:self.length]
+            self.buffer = grown
+        self.buffer[self.length:end] = samples
+        self.length = end
+
+    def view(self):
+        return self.buffer[:self.length]
+
+    def drop_front(self, count):
+        count = min(max(count, 0), self.length)
+        self.buffer[:self.length - count] = self.buffer[count:self.length]
+        self.length -= count
+
+    def clear(self):
+        self.length = 0
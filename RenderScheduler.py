@@ -0,0 +1,59 @@
+import time
+
+DRAW_TIME_SMOOTHING = 0.1  # weight of the newest draw in the running average draw time
+MAX_DRAW_SHARE = 0.5  # back off when drawing would take more than this share of the Tk loop's time
+
+class RenderScheduler:
+    """
+    Drives a draw callback from the Tk loop at an adaptive rate instead of a fixed ``after`` interval.
+
+    ``draw`` returns whether it actually drew anything. The scheduler aims for ``target_fps``, measures the
+    draw time and stretches the interval when drawing would take more than MAX_DRAW_SHARE of the loop's time.
+    After ``idle_after`` seconds without anything drawn (silence, stalled DSP) or while the window is
+    unmapped / minimized it polls at ``idle_interval_ms`` only, and goes back to full rate on the next draw.
+    """
+    def __init__(self, root, draw, target_fps=30, idle_interval_ms=500, idle_after=1.0, max_interval_ms=250):
+        self.root = root
+        self.draw = draw
+        self.frame_interval_ms = 1000 / target_fps
+        self.idle_interval_ms = idle_interval_ms
+        self.idle_after = idle_after
+        self.max_interval_ms = max_interval_ms
+
+        self.draw_time_ms = 0.0
+        self.interval_ms = self.frame_interval_ms
+        self.last_drawn = time.perf_counter()
+        self.draws = 0
+        self.skips = 0
+
+    def start(self):
+        self.root.after(0, self.tick)
+
+    def visible(self):
+        return self.root.winfo_ismapped() and self.root.state() not in ('iconic', 'withdrawn')
+
+    def tick(self):
+        if not self.visible():
+            self.interval_ms = self.idle_interval_ms
+            self.root.after(self.idle_interval_ms, self.tick)
+            return
+
+        start = time.perf_counter()
+        drew = self.draw()
+        now = time.perf_counter()
+
+        if drew:
+            self.draws += 1
+            self.last_drawn = now
+            draw_ms = (now - start) * 1000
+            self.draw_time_ms += (draw_ms - self.draw_time_ms) * (DRAW_TIME_SMOOTHING if self.draws > 1 else 1)
+        else:
+            self.skips += 1
+
+        if now - self.last_drawn > self.idle_after:
+            self.interval_ms = self.idle_interval_ms
+        else:
+            # keep drawing under MAX_DRAW_SHARE of the loop, never slower than max_interval_ms
+            self.interval_ms = min(max(self.frame_interval_ms, self.draw_time_ms / MAX_DRAW_SHARE),
+                                   self.max_interval_ms)
+        self.root.after(max(int(self.interval_ms - (now - start) * 1000), 1), self.tick)
@@ -0,0 +1,452 @@
+import numpy as np
+
+try:  # numpy >= 2.0 runs single precision FFTs and can write them into a given buffer
+    np.fft.rfft(np.zeros(8, dtype=np.float32), out=np.empty(5, dtype=np.complex64))
+    RFFT_HAS_OUT = True
+except TypeError:
+    RFFT_HAS_OUT = False
+
+# band sums are divided by (bins in band) ** BAND_NORM_EXPONENT so wide treble bands don't dwarf the bass
+BAND_NORM_EXPONENT = 1/5
+# band levels are rescaled to what a REFERENCE_FFT_SIZE point FFT gives, so the EQ's y limits hold for any FFT size
+REFERENCE_FFT_SIZE = 1024
+
+CHUNK = 1024  # capture block, frames the EQ reads at a time
+FFT_SIZE = 4096  # decoupled from CHUNK by the STFT buffer, 11.7Hz bins at 48KHz
+HOP_SIZE = CHUNK  # samples between bar updates, keeps latency at one capture block
+MAX_LEVEL = 9.5*1e6  # bar levels are clipped to this for display and output
+
+# Bass 0 - 250, Mids 250 - 4K, highs (presence and brilliance) -> 22K, each bar ends at its label
+DEFAULT_FREQUENCY_BINS = [64, 128, 256, 512, 1000, 2000, 4000, 8000, 16000, 22000]
+DEFAULT_LABELS = ['64', '128', '256', '512', '1K', '2K', '4K', '8K', '16K', '22K']
+
+def bar_layout(sample_rate, bars=None, octave_fraction=None):
+    """
+    Returns (frequency_bins, low_edge, labels) for BandMapper, from ``bars`` log-spaced bars,
+    1/``octave_fraction`` octave bands, or the default 10 bars when neither is given.
+    Generated bars are labelled with their centre frequency.
+    """
+    if octave_fraction:
+        edges = octave_bands(octave_fraction, sample_rate)
+    elif bars:
+        edges = log_bands(bars, sample_rate)
+    else:
+        return DEFAULT_FREQUENCY_BINS, 0.0, DEFAULT_LABELS
+    return list(edges[1:]), float(edges[0]), band_labels(np.sqrt(edges[:-1] * edges[1:]))
+
+def log_bands(n_bars, sample_rate, f_min=20.0, f_max=22000.0):
+    """Edges of ``n_bars`` log-spaced bars between ``f_min`` and ``f_max`` (capped at nyquist), n_bars + 1 values"""
+    return np.geomspace(f_min, min(f_max, sample_rate / 2), n_bars + 1)
+
+def octave_bands(fraction, sample_rate, f_min=20.0, f_max=22000.0):
+    """Edges of the 1/``fraction`` octave bands (centred on 1KHz multiples) that fit between ``f_min`` and ``f_max``"""
+    f_max = min(f_max, sample_rate / 2)
+    k_min = int(np.ceil(fraction * np.log2(f_min / 1000) + 0.5))
+    k_max = int(np.floor(fraction * np.log2(f_max / 1000) - 0.5))
+    return 1000 * 2 ** ((np.arange(k_min, k_max + 2) - 0.5) / fraction)
+
+def band_labels(frequencies):
+    """Axis labels like 64, 500, 1K, 2.5K, 16K"""
+    labels = []
+    for f in frequencies:
+        if f >= 1000:
+            labels.append(f"{f / 1000:.2g}K" if f < 10000 else f"{f / 1000:.0f}K")
+        else:
+            labels.append(f"{f:.0f}")
+    return labels
+
+class BandMapper:
+    """
+    Maps an FFT magnitude spectrum onto EQ bars.
+
+    Bar i covers [frequency_bins[i - 1], frequency_bins[i]) with ``low_edge`` below the first bar. Bin edges
+    are worked out once from the real sample rate and FFT size. Bars spanning at least one FFT bin are summed,
+    bars narrower than a bin (the bass end of 64+ log bars) are linearly interpolated from the spectrum at
+    their centre frequency instead of being left empty. Each frame is one np.add.reduceat, two np.take for
+    the interpolated bars and one np.take gathering both into bar order, all into preallocated buffers, so
+    the cost barely depends on the number of bars.
+    """
+    def __init__(self, sample_rate, fft_size, frequency_bins, low_edge=0.0):
+        self.sample_rate = sample_rate
+        self.fft_size = fft_size
+        self.frequency_bins = list(frequency_bins)
+
+        n_bins = fft_size // 2 + 1
+        bin_hz = sample_rate / fft_size
+
+        # bar edges in (fractional) bins, bin k covers [k - .5, k + .5)
+        his = np.asarray(self.frequency_bins, dtype=np.float64) / bin_hz
+        los = np.append(low_edge / bin_hz, his[:-1])
+        starts = np.clip(np.rint(los).astype(np.intp), 1, n_bins)  # skip DC
+        stops = np.clip(np.rint(his).astype(np.intp), 1, n_bins)
+
+        # bars starting past nyquist (e.g. 22K at 32KHz) have no bins and stay at zero
+        active = starts < n_bins
+        wide = active & (stops > starts)
+        narrow = active & ~wide
+        wide_bars = np.flatnonzero(wide)
+        narrow_bars = np.flatnonzero(narrow)
+
+        # reduceat over interleaved [start, stop) pairs, the even outputs are the bar sums
+        reduce_idx = np.stack((starts[wide], stops[wide]), axis=-1).ravel()
+        if len(reduce_idx) and reduce_idx[-1] == n_bins:
+            reduce_idx = reduce_idx[:-1]  # the last pair runs to the end of the spectrum anyway
+        self.reduce_idx = reduce_idx
+
+        centres = np.clip((los[narrow] + his[narrow]) / 2, 0, n_bins - 1)
+        self.interp_lo = np.minimum(np.floor(centres).astype(np.intp), n_bins - 2)
+        self.interp_hi = self.interp_lo + 1
+        self.interp_frac = (centres - self.interp_lo).astype(np.float32)
+
+        # gather order over [reduceat outputs | interpolated bars | a trailing zero for inactive bars]
+        n_sums, n_interp = len(reduce_idx), len(narrow_bars)
+        self.order = np.full(len(self.frequency_bins), n_sums + n_interp, dtype=np.intp)
+        self.order[wide_bars] = np.arange(0, 2 * len(wide_bars), 2)
+        self.order[narrow_bars] = n_sums + np.arange(n_interp)
+        self.n_sums = n_sums
+        self.n_combined = n_sums + n_interp + 1
+
+        counts = np.ones(len(self.frequency_bins))
+        counts[wide] = stops[wide] - starts[wide]
+        self.scale = np.zeros(len(self.frequency_bins), dtype=np.float32)
+        self.scale[active] = REFERENCE_FFT_SIZE / fft_size / counts[active] ** BAND_NORM_EXPONENT
+
+        self._buffers = {}
+
+    def _get_buffers(self, lead_shape):
+        buffers = self._buffers.get(lead_shape)
+        if buffers is None:
+            n_interp = len(self.interp_lo)
+            buffers = self._buffers[lead_shape] = (
+                np.zeros(lead_shape + (self.n_combined,), dtype=np.float32),
+                np.empty(lead_shape + (n_interp,), dtype=np.float32),
+                np.zeros(lead_shape + (len(self.frequency_bins),), dtype=np.float32),
+            )
+        return buffers
+
+    def reduce(self, amplitude, out=None):
+        """
+        Sum ``amplitude`` (last axis = FFT bins, any leading axes e.g. channels) into bars.
+        Returns ``out``, by default a buffer preallocated per leading shape and reused on the next call.
+        """
+        combined, interp, default_out = self._get_buffers(amplitude.shape[:-1])
+        if out is None:
+            out = default_out
+        if self.n_sums:
+            np.add.reduceat(amplitude, self.reduce_idx, axis=-1, out=combined[..., :self.n_sums])
+        if len(self.interp_lo):
+            lo = combined[..., self.n_sums:-1]
+            np.take(amplitude, self.interp_lo, axis=-1, out=lo)
+            np.take(amplitude, self.interp_hi, axis=-1, out=interp)
+            np.subtract(interp, lo, out=interp)
+            interp *= self.interp_frac
+            lo += interp
+        np.take(combined, self.order, axis=-1, out=out)
+        np.multiply(out, self.scale, out=out)
+        return out
+
+CHANNEL_MODES = ('downmix', 'stereo', 'midside')
+
+class ChannelMixer:
+    """
+    Splits an interleaved int16 capture block into the channel sets the EQ draws, shape (sets, frames).
+
+    The block is deinterleaved with a zero-copy reshape. ``downmix`` sums every channel into one mono set,
+    ``stereo`` keeps front left/right as two sets and ``midside`` gives L+R and L-R. Sums are used instead of
+    means so bar levels match what the interleaved FFT used to show. Stereo modes on a mono device fall
+    back to ``downmix``. The returned array is reused on the next call.
+    """
+    def __init__(self, channels, mode='downmix'):
+        if mode not in CHANNEL_MODES:
+            raise ValueError(f"channel mode must be one of {CHANNEL_MODES}, got {mode!r}")
+        self.channels = channels
+        self.mode = mode if channels >= 2 else 'downmix'
+        self.n_sets = 1 if self.mode == 'downmix' else 2
+        self._buffers = {}
+
+    def _get_buffer(self, frames):
+        buffer = self._buffers.get(frames)
+        if buffer is None:
+            buffer = self._buffers[frames] = np.empty((self.n_sets, frames), dtype=np.float32)
+        return buffer
+
+    def process(self, samples):
+        frames = samples.reshape(-1, self.channels)
+        if self.mode == 'stereo':
+            return frames[:, :2].T  # strided view, FFTStage casts it while windowing
+
+        out = self._get_buffer(len(frames))
+        if self.mode == 'downmix':
+            np.add.reduce(frames, axis=1, dtype=np.float32, out=out[0])
+        else:
+            np.add(frames[:, 0], frames[:, 1], dtype=np.float32, out=out[0])
+            np.subtract(frames[:, 0], frames[:, 1], dtype=np.float32, out=out[1])
+        return out
+
+def a_weighting_db(f):
+    # IEC 61672-1, 0 dB at 1KHz
+    f2 = f ** 2
+    ra = 12194.0 ** 2 * f2 ** 2 / (
+        (f2 + 20.6 ** 2) * np.sqrt((f2 + 107.7 ** 2) * (f2 + 737.9 ** 2)) * (f2 + 12194.0 ** 2))
+    return 20 * np.log10(ra) + 2.0
+
+def c_weighting_db(f):
+    # IEC 61672-1, 0 dB at 1KHz
+    f2 = f ** 2
+    rc = 12194.0 ** 2 * f2 / ((f2 + 20.6 ** 2) * (f2 + 12194.0 ** 2))
+    return 20 * np.log10(rc) + 0.06
+
+def itu_r_468_db(f):
+    # ITU-R BS.468-4, +12.2 dB at 6.3KHz
+    h1 = -4.737338981378384e-24 * f ** 6 + 2.043828333606125e-15 * f ** 4 - 1.363894795463638e-07 * f ** 2 + 1
+    h2 = 1.306612257412824e-19 * f ** 5 - 2.118150887518656e-11 * f ** 3 + 5.559488023498642e-04 * f
+    r = 1.246332637532143e-04 * f / np.sqrt(h1 ** 2 + h2 ** 2)
+    return 18.2 + 20 * np.log10(r)
+
+WEIGHTING_CURVES = {
+    'flat': lambda f: np.zeros_like(f),
+    'a': a_weighting_db,
+    'c': c_weighting_db,
+    'itu468': itu_r_468_db,
+}
+
+class SpectrumWeighting:
+    """
+    Perceptual reweighting of a magnitude spectrum (see WEIGHTING_CURVES).
+
+    Each curve is turned into a per-bin gain vector for the sample rate and FFT size the first time it's
+    selected and cached, so applying it is one in-place multiply and switching curves at runtime is a
+    reference swap that the DSP thread picks up on its next frame.
+    """
+    def __init__(self, sample_rate, fft_size, curve='flat'):
+        self.frequencies = np.fft.rfftfreq(fft_size, 1 / sample_rate)
+        self._gains = {}
+        self.set_curve(curve)
+
+    def set_curve(self, curve):
+        if curve not in WEIGHTING_CURVES:
+            raise ValueError(f"weighting curve must be one of {tuple(WEIGHTING_CURVES)}, got {curve!r}")
+        gain = self._gains.get(curve)
+        if gain is None:
+            with np.errstate(divide='ignore'):  # DC is -inf dB, a gain of 0
+                gain = 10 ** (WEIGHTING_CURVES[curve](self.frequencies) / 20)
+            gain = self._gains[curve] = gain.astype(np.float32)
+        self.gain = gain
+        self.curve = curve
+
+    def next_curve(self):
+        """Switches to the curve after the current one in WEIGHTING_CURVES, returns its name"""
+        curves = list(WEIGHTING_CURVES)
+        self.set_curve(curves[(curves.index(self.curve) + 1) % len(curves)])
+        return self.curve
+
+    def apply(self, magnitude):
+        """Weights ``magnitude`` (last axis = FFT bins) in place and returns it"""
+        np.multiply(magnitude, self.gain, out=magnitude)
+        return magnitude
+
+class FFTStage:
+    """
+    Windowed real FFT magnitude of a block of samples.
+
+    The hamming window is cached per block size and the windowed frame, spectrum and magnitude
+    buffers are preallocated per input shape, so the steady-state loop allocates nothing.
+    Everything runs in float32. The returned magnitude array is reused on the next call.
+    """
+    def __init__(self):
+        self._windows = {}
+        self._buffers = {}
+
+    def window(self, size):
+        window = self._windows.get(size)
+        if window is None:
+            window = self._windows[size] = np.hamming(size).astype(np.float32)
+        return window
+
+    def _get_buffers(self, shape):
+        buffers = self._buffers.get(shape)
+        if buffers is None:
+            spectrum_shape = shape[:-1] + (shape[-1] // 2 + 1,)
+            buffers = self._buffers[shape] = (
+                np.empty(shape, dtype=np.float32),
+                np.empty(spectrum_shape, dtype=np.complex64),
+                np.empty(spectrum_shape, dtype=np.float32),
+            )
+        return buffers
+
+    def process(self, samples):
+        """Magnitude spectrum of ``samples`` along the last axis, shape (..., size // 2 + 1)"""
+        frame, spectrum, magnitude = self._get_buffers(samples.shape)
+        # cast first, multiplying int16 straight into float32 makes numpy allocate a cast buffer
+        np.copyto(frame, samples)
+        np.multiply(frame, self.window(samples.shape[-1]), out=frame)
+        if RFFT_HAS_OUT:
+            np.fft.rfft(frame, axis=-1, out=spectrum)
+        else:
+            spectrum[...] = np.fft.rfft(frame, axis=-1)
+        np.abs(spectrum, out=magnitude)
+        return magnitude
+
+class STFTBuffer:
+    """
+    Circular sample buffer that decouples the FFT size from the capture block size.
+
+    Capture blocks of shape (sets, frames) are pushed in, and every ``hop`` samples the latest ``fft_size``
+    samples come out as a (sets, fft_size) view. Every sample is written twice, at ``i`` and ``i + fft_size``,
+    so the current window is always one contiguous slice and nothing gets copied or rolled per hop.
+    """
+    def __init__(self, fft_size, hop, n_sets=1):
+        if not 0 < hop <= fft_size:
+            raise ValueError(f"hop must be between 1 and fft_size ({fft_size}), got {hop}")
+        self.fft_size = fft_size
+        self.hop = hop
+        self.buffer = np.zeros((n_sets, 2 * fft_size), dtype=np.float32)
+        self.pos = 0  # next write index, also where the current window starts
+        self.since_hop = 0
+
+    def _write(self, samples):
+        n, size, pos = samples.shape[-1], self.fft_size, self.pos
+        first = min(n, size - pos)
+        self.buffer[:, pos:pos + first] = samples[:, :first]
+        self.buffer[:, pos + size:pos + size + first] = samples[:, :first]
+        if n > first:
+            rest = n - first
+            self.buffer[:, :rest] = samples[:, first:]
+            self.buffer[:, size:size + rest] = samples[:, first:]
+        self.pos = (pos + n) % size
+
+    def push(self, samples):
+        """Adds a block of samples, yields a view of the latest window each time a hop completes"""
+        offset, n = 0, samples.shape[-1]
+        while offset < n:
+            take = min(n - offset, self.hop - self.since_hop)
+            self._write(samples[:, offset:offset + take])
+            offset += take
+            self.since_hop += take
+            if self.since_hop == self.hop:
+                self.since_hop = 0
+                yield self.buffer[:, self.pos:self.pos + self.fft_size]
+
+class BarSmoother:
+    """
+    Attack/release smoothing and peak hold for the bar levels, run once per hop in the DSP thread.
+
+    Time constants are in milliseconds and converted to per-hop coefficients using the real hop duration
+    (hop / sample_rate), so bars move the same way whatever the sample rate, hop or render cadence.
+    ``state`` is (2, sets, bands): ``state[0]`` are the smoothed levels and ``state[1]`` the peak markers,
+    ready for the renderer to draw as is. Peaks hold for ``peak_hold_ms`` then fall exponentially.
+    """
+    def __init__(self, shape, hop_seconds, attack_ms=25, release_ms=250, peak_hold_ms=500, peak_fall_ms=400):
+        self.state = np.zeros((2,) + tuple(shape), dtype=np.float32)
+        self.levels, self.peaks = self.state
+        self.hop_seconds = hop_seconds
+        self.attack = 1 - np.exp(-hop_seconds * 1000 / attack_ms)
+        self.release = 1 - np.exp(-hop_seconds * 1000 / release_ms)
+        self.peak_hold = peak_hold_ms / 1000
+        self.peak_fall_rate = 1000 / peak_fall_ms  # peaks past their hold fall as exp(-rate * seconds)
+
+        self._hold_left = np.zeros(shape, dtype=np.float32)
+        self._coef = np.empty(shape, dtype=np.float32)
+        self._diff = np.empty(shape, dtype=np.float32)
+        self._mask = np.empty(shape, dtype=bool)
+
+    def update(self, target):
+        """Moves the levels towards ``target`` by one hop and updates the peaks, returns ``state``"""
+        levels, peaks, coef, diff, mask = self.levels, self.peaks, self._coef, self._diff, self._mask
+
+        # exponential approach, attack coefficient where rising and release where falling
+        np.greater(target, levels, out=mask)
+        coef.fill(self.release)
+        np.copyto(coef, self.attack, where=mask)
+        np.subtract(target, levels, out=diff)
+        diff *= coef
+        levels += diff
+
+        # peaks reset their hold timer when pushed up, otherwise fall once the hold runs out
+        np.greater_equal(levels, peaks, out=mask)
+        np.maximum(peaks, levels, out=peaks)
+        self._hold_left -= self.hop_seconds
+        np.copyto(self._hold_left, self.peak_hold, where=mask)
+        # only the part of the hop past the hold falls, so the fall starts at the same time whatever the hop
+        np.clip(self._hold_left, -self.hop_seconds, 0, out=diff)
+        diff *= self.peak_fall_rate
+        np.exp(diff, out=diff)
+        peaks *= diff
+        np.maximum(peaks, levels, out=peaks)
+        return self.state
+
+class SpectrogramBuffer:
+    """
+    Fixed-size history of bar spectra for the waterfall view, a (history, bands) uint8 ring buffer.
+
+    Rows are written at ``rows_written % history`` and never moved (no np.roll or re-stacking), so memory
+    is constant however long it runs. Levels are mapped to 0-255 over ``db_range`` dB below ``max_level``.
+    Readers keep their own count of rows seen and fetch only the rows written since.
+    """
+    def __init__(self, history, n_bands, max_level, db_range=60):
+        self.history = history
+        self.image = np.zeros((history, n_bands), dtype=np.uint8)
+        self.rows_written = 0
+        self.floor = max_level * 10 ** (-db_range / 20)
+        self._gain = 255 / np.log10(max_level / self.floor)
+        self._scaled = np.empty(n_bands, dtype=np.float32)
+
+    def push(self, levels):
+        scaled = self._scaled
+        np.maximum(levels, self.floor, out=scaled)
+        scaled /= self.floor
+        np.log10(scaled, out=scaled)
+        scaled *= self._gain
+        np.minimum(scaled, 255, out=scaled)
+        self.image[self.rows_written % self.history] = scaled
+        self.rows_written += 1
+
+    def row(self, index):
+        """Row of the ``index``-th spectrum ever pushed, valid while it's within the last ``history``"""
+        return self.image[index % self.history]
+
+class SpectrumPipeline:
+    """
+    The EQ's whole DSP chain for one capture stream, shared by the visualizer and the headless pipeline.
+
+    Interleaved int16 capture blocks go through ChannelMixer -> STFTBuffer -> FFTStage -> SpectrumWeighting
+    -> BandMapper -> BarSmoother. ``process`` yields once per completed hop; the yielded arrays are reused
+    buffers, copy them if they're needed past the next hop.
+    """
+    def __init__(self, sample_rate, channels, channel_mode='downmix', bars=None, octave_fraction=None,
+                 fft_size=4096, hop=1024, weighting='flat',
+                 attack_ms=25, release_ms=250, peak_hold_ms=500, peak_fall_ms=400):
+        self.sample_rate = sample_rate
+        # default 10 octave-ish bars, or generated log / fractional octave bars for the current sample rate
+        self.frequency_bins, low_edge, self.labels = bar_layout(sample_rate, bars, octave_fraction)
+        self.band_mapper = BandMapper(sample_rate, fft_size, self.frequency_bins, low_edge)
+        self.fft_stage = FFTStage()
+        self.channel_mixer = ChannelMixer(channels, channel_mode)
+        self.stft_buffer = STFTBuffer(fft_size, hop, self.channel_mixer.n_sets)
+        self.weighting = SpectrumWeighting(sample_rate, fft_size, weighting)
+        self.smoother = BarSmoother((self.channel_mixer.n_sets, len(self.frequency_bins)), hop / sample_rate,
+                                    attack_ms, release_ms, peak_hold_ms, peak_fall_ms)
+
+    @property
+    def n_sets(self):
+        return self.channel_mixer.n_sets
+
+    def process(self, samples):
+        """Feeds an interleaved int16 block, yields (bands, state) per hop: raw bar levels and smoother state"""
+        # deinterleave, then run one FFT call over all channel sets per completed hop
+        for window in self.stft_buffer.push(self.channel_mixer.process(samples)):
+            amplitude = self.weighting.apply(self.fft_stage.process(window))
+            bands = self.band_mapper.reduce(amplitude)
+            yield bands, self.smoother.update(bands)
+
+def add_arguments(parser):
+    parser.add_argument('--stereo', action='store_true', help="left/right bar sets")
+    parser.add_argument('--midside', action='store_true', help="mid/side bar sets")
+    parser.add_argument('--bars', type=int, help="number of log-spaced bars, e.g. 64, 128 or 256")
+    parser.add_argument('--octaves', type=int, metavar='N', help="1/N octave bands, e.g. 3 or 6")
+    parser.add_argument('--weighting', default='flat', choices=list(WEIGHTING_CURVES), help="perceptual EQ weighting")
+
+def options_from_args(args):
+    """SpectrumPipeline keyword arguments from the flags of add_arguments"""
+    channel_mode = 'midside' if args.midside else 'stereo' if args.stereo else 'downmix'
+    return dict(channel_mode=channel_mode, bars=args.bars, octave_fraction=args.octaves, weighting=args.weighting)
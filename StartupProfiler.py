@@ -0,0 +1,133 @@
+"""
+Startup profiling for --profile-startup.
+
+Modules wrap their expensive startup steps in ``profiler.phase(name)`` and note milestones with
+``profiler.mark(name)``, both are no-ops unless the profiler was enabled. The report is one JSON object with
+time-to-first-frame, time-to-first-transcript and the wall time and RSS change of every phase, so startup
+regressions show up in a diff between releases. Phases on different threads overlap, their RSS deltas are
+process-wide.
+"""
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+def current_rss():
+    """Resident set size in bytes, None where it can't be read"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    if os.name == 'nt':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + \
+                       [(name, ctypes.c_size_t) for name in (
+                           "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                           "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage",
+                           "PeakPagefileUsage")]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    return None
+
+class StartupProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.start = time.perf_counter()  # module import, as close to process start as the entry point allows
+        self.start_rss = None
+        self.phases = []
+        self.marks = {}
+        self.output = None
+        self.finished = False
+        self.lock = threading.Lock()
+
+    def enable(self, output="-", timeout=None):
+        """Starts recording, the report goes to ``output`` ("-" for stderr) on ``finish`` or after ``timeout``"""
+        self.enabled = True
+        self.output = output
+        self.start_rss = current_rss()
+        if timeout is not None:
+            timer = threading.Timer(timeout, self.finish)
+            timer.daemon = True
+            timer.start()
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        start, rss_before = self.elapsed(), current_rss()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            end, rss_after = self.elapsed(), current_rss()
+            with self.lock:
+                self.phases.append({
+                    "name": name,
+                    "thread": threading.current_thread().name,
+                    "start": start,
+                    "wall": end - start,
+                    "rss_before": rss_before,
+                    "rss_after": rss_after,
+                    "rss_delta": None if rss_before is None or rss_after is None else rss_after - rss_before,
+                    "failed": failed,
+                })
+
+    def mark(self, name):
+        """Records the first time ``name`` happens, later calls are ignored"""
+        if not self.enabled or name in self.marks:
+            return
+        with self.lock:
+            self.marks.setdefault(name, self.elapsed())
+
+    def report(self):
+        with self.lock:
+            return {
+                "time_to_first_frame": self.marks.get("first_frame"),
+                "time_to_first_transcript": self.marks.get("first_transcript"),
+                "marks": dict(self.marks),
+                "phases": sorted(self.phases, key=lambda phase: phase["start"]),
+                "rss_start": self.start_rss,
+                "rss_end": current_rss(),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+            }
+
+    def finish(self):
+        """Writes the report once, later calls do nothing"""
+        with self.lock:
+            if not self.enabled or self.finished:
+                return
+            self.finished = True
+        report = json.dumps(self.report())
+        if self.output == "-":
+            print(report, file=sys.stderr, flush=True)
+        else:
+            with open(self.output, 'w') as f:
+                f.write(report + "\n")
+
+profiler = StartupProfiler()
+
+def add_arguments(parser):
+    parser.add_argument('--profile-startup', nargs='?', const='-', metavar='FILE',
+                        help="write a JSON startup profile (phases, time to first frame / transcript) to FILE or stderr")
@@ -0,0 +1,89 @@
+import time
+import tkinter as tk
+import numpy as np
+
+FRAME_TIME_SMOOTHING = 0.05  # weight of the newest frame in the running average frame time
+LABEL_AREA = 40  # pixels under the bars for the frequency labels
+
+class TkBarRenderer:
+    """
+    EQ bars and peak markers drawn straight onto a tk.Canvas, without matplotlib.
+
+    Every bar and marker is a canvas rectangle created once (again on resize). Each frame converts the levels to
+    pixel tops in one vectorized step and only calls ``coords`` for the rectangles whose top pixel moved.
+    Takes the same levels / peaks as MatplotlibRenderer.BlitBarRenderer and keeps the same running
+    ``frame_time_ms``.
+    """
+    description = 'tk canvas'
+
+    def __init__(self, master, n_bars, labels, n_sets, colors, background, ylim, peak_height,
+                 max_tick_labels=12):
+        self.n_bars = n_bars
+        self.labels = labels
+        self.n_sets = n_sets
+        self.colors = colors
+        self.ylim = ylim
+        self.peak_height = peak_height
+        self.tick_step = -(-n_bars // max_tick_labels)
+        self.frame_time_ms = 0.0
+        self.frames = 0
+
+        self.canvas = tk.Canvas(master, bg=background, highlightthickness=0, bd=0)
+        self.bar_items = self.peak_items = None
+        self.last_levels = np.zeros((n_sets, n_bars))
+        self.last_peaks = np.zeros((n_sets, n_bars))
+        self.canvas.bind("<Configure>", self.on_resize)
+
+    def grid(self, **kwargs):
+        self.canvas.grid(**kwargs)
+
+    def on_resize(self, event):
+        width, height = max(event.width, 1), max(event.height, 1)
+        self.bottom = max(height - LABEL_AREA, 1)
+        self.px_per_level = self.bottom / self.ylim
+        self.peak_px = max(round(self.peak_height * self.px_per_level), 1)
+
+        # same layout as the matplotlib chart, bar sets side by side within 80% of each slot
+        slot = width / self.n_bars
+        bar_width = 0.8 * slot / self.n_sets
+        lefts = (np.arange(self.n_bars) * slot + 0.1 * slot)[None, :] + (np.arange(self.n_sets) * bar_width)[:, None]
+        self.lefts = lefts.round().astype(int)
+        self.rights = (lefts + bar_width).round().astype(int)
+
+        self.canvas.delete("all")
+        self.bar_items = np.empty((self.n_sets, self.n_bars), dtype=object)
+        self.peak_items = np.empty((self.n_sets, self.n_bars), dtype=object)
+        for i in range(self.n_sets):
+            for j in range(self.n_bars):
+                self.bar_items[i, j] = self.canvas.create_rectangle(
+                    self.lefts[i, j], self.bottom, self.rights[i, j], self.bottom, fill=self.colors[i], width=0)
+                self.peak_items[i, j] = self.canvas.create_rectangle(
+                    self.lefts[i, j], self.bottom - self.peak_px, self.rights[i, j], self.bottom,
+                    fill=self.colors[i], width=0)
+        for j in range(0, self.n_bars, self.tick_step):
+            self.canvas.create_text((j + 0.5) * slot, self.bottom + 4, text=self.labels[j], fill=self.colors[0],
+                                    angle=45, anchor="ne")
+        self.bar_tops = np.full((self.n_sets, self.n_bars), self.bottom)
+        self.peak_tops = np.full((self.n_sets, self.n_bars), self.bottom - self.peak_px)
+        self.draw(self.last_levels, self.last_peaks)
+
+    def update_items(self, items, tops, new_tops, height):
+        moved = np.nonzero(new_tops != tops)
+        for i, j in zip(*moved):
+            top = new_tops[i, j]
+            self.canvas.coords(items[i, j], self.lefts[i, j], top, self.rights[i, j],
+                               self.bottom if height is None else top + height)
+        tops[moved] = new_tops[moved]
+
+    def draw(self, levels, peaks):
+        start = time.perf_counter()
+        self.last_levels, self.last_peaks = levels, peaks
+        if self.bar_items is None:
+            return
+        to_top = lambda values: self.bottom - np.minimum(values * self.px_per_level, self.bottom).astype(int)
+        self.update_items(self.bar_items, self.bar_tops, to_top(levels), None)
+        self.update_items(self.peak_items, self.peak_tops, to_top(peaks) - self.peak_px, self.peak_px)
+
+        frame_ms = (time.perf_counter() - start) * 1000
+        self.frames += 1
+        self.frame_time_ms += (frame_ms - self.frame_time_ms) * (FRAME_TIME_SMOOTHING if self.frames > 1 else 1)
@@ -1,20 +1,39 @@
 #import openai
-import whisper
 import os
-import torch
+from StartupProfiler import profiler
+with profiler.phase("import torch"):
+    import torch
+with profiler.phase("import whisper"):
+    import whisper
+
+# lag policy "fast": a single greedy pass, no re-decoding at higher temperatures when a pass looks unreliable
+FAST_DECODE = {"temperature": 0.0, "condition_on_previous_text": False}
 
 def get_model(use_api):
     return WhisperTranscriber()
 
 class WhisperTranscriber:
     def __init__(self):
-        self.audio_model = whisper.load_model(os.path.join(os.getcwd()+os.sep+'models'+os.sep, 'tiny.en.pt'))
+        with profiler.phase("model load"):
+            self.audio_model = whisper.load_model(os.path.join(os.getcwd()+os.sep+'models'+os.sep, 'tiny.en.pt'))
         print(f"[INFO] Whisper using GPU: " + str(torch.cuda.is_available()))
 
-    def get_transcription(self, wav_file_path):
+    def get_segments(self, audio, fast=False):
+        """Whisper's segments of ``audio`` as (start seconds, end seconds, text), empty on errors"""
+        try:
+            result = self.audio_model.transcribe(audio, fp16=torch.cuda.is_available(), **(FAST_DECODE if fast else {}))
+        except Exception as e:
+            print(e)
+            return []
+        return [(segment['start'], segment['end'], segment['text']) for segment in result['segments']]
+
+    def get_words(self, audio, prompt=None, fast=False):
+        """Words of ``audio`` as (start seconds, end seconds, text), decoding conditioned on ``prompt``"""
         try:
-            result = self.audio_model.transcribe(wav_file_path, fp16=torch.cuda.is_available())
+            result = self.audio_model.transcribe(audio, fp16=torch.cuda.is_available(), word_timestamps=True,
+                                                 initial_prompt=prompt or None, **(FAST_DECODE if fast else {}))
         except Exception as e:
             print(e)
-            return ''
-        return result['text'].strip()
+            return []
+        return [(word['start'], word['end'], word['word']) for segment in result['segments']
+                for word in segment.get('words', ())]
@@ -0,0 +1,73 @@
+import tkinter as tk
+
+PALETTE_STOPS = ('#2E3440', '#A3BE8C', '#ECEFF4')  # Nord background -> green -> snow for 0, 128, 255
+
+def make_palette(stops=PALETTE_STOPS):
+    """256 '#rrggbb' strings blending linearly through ``stops``"""
+    rgb = [tuple(int(stop[i:i + 2], 16) for i in (1, 3, 5)) for stop in stops]
+    palette = []
+    for value in range(256):
+        pos = value / 255 * (len(rgb) - 1)
+        i = min(int(pos), len(rgb) - 2)
+        t = pos - i
+        palette.append('#%02x%02x%02x' % tuple(round(a + (b - a) * t) for a, b in zip(rgb[i], rgb[i + 1])))
+    return palette
+
+class WaterfallRenderer:
+    """
+    Scrolling spectrogram drawn from a SpectrumAnalyzer.SpectrogramBuffer on a tk.Canvas.
+
+    One PhotoImage the size of the canvas is used as a circular image: each new spectrum is put as a single
+    column at the next write column, and the image is shown twice side by side with its canvas coordinates
+    offset by the write column, so the newest column is always at the right edge. A frame costs one column
+    upload plus two coords() calls, the rest of the image is never touched except on resize.
+    """
+    def __init__(self, master, spectrogram, background):
+        self.spectrogram = spectrogram
+        self.palette = make_palette()
+        self.canvas = tk.Canvas(master, bg=background, highlightthickness=0, bd=0)
+        self.image = None
+        self.rows_drawn = 0
+        self.columns = 0
+        self.canvas.bind("<Configure>", self.on_resize)
+
+    def grid(self, **kwargs):
+        self.canvas.grid(**kwargs)
+
+    def on_resize(self, event):
+        # a new image for the new size, repainted from the history that still fits
+        self.width, height = max(event.width, 1), max(event.height, 1)
+        self.band_px = max(height // self.spectrogram.image.shape[1], 1)
+        self.image = tk.PhotoImage(width=self.width, height=self.band_px * self.spectrogram.image.shape[1])
+        self.canvas.delete("all")
+        self.left = self.canvas.create_image(0, 0, image=self.image, anchor="nw")
+        self.right = self.canvas.create_image(self.width, 0, image=self.image, anchor="nw")
+        self.columns = 0
+        self.rows_drawn = max(self.spectrogram.rows_written - min(self.width, self.spectrogram.history), 0)
+        self.draw()
+
+    def put_column(self, row):
+        # low frequencies at the bottom, each band band_px pixels tall
+        colors = []
+        for value in row[::-1]:
+            colors.extend([self.palette[value]] * self.band_px)
+        self.image.put(" ".join(colors), to=(self.columns % self.width, 0))
+        self.columns += 1
+
+    def draw(self):
+        """Uploads the spectra pushed since the last draw, returns whether anything changed"""
+        if self.image is None:
+            return False
+        rows_written = self.spectrogram.rows_written
+        # rows older than the image width or the ring would be overwritten straight away
+        self.rows_drawn = max(self.rows_drawn, rows_written - min(self.width, self.spectrogram.history))
+        if self.rows_drawn == rows_written:
+            return False
+        for index in range(self.rows_drawn, rows_written):
+            self.put_column(self.spectrogram.row(index).tolist())
+        self.rows_drawn = rows_written
+
+        offset = self.columns % self.width
+        self.canvas.coords(self.left, -offset, 0)
+        self.canvas.coords(self.right, self.width - offset, 0)
+        return True
@@ -0,0 +1,68 @@
+"""
+Micro-benchmark of the per-frame EQ spectrum work, old inline code vs FFTStage + BandMapper.
+
+Run from the repo root: python -m benchmarks.fft_benchmark [frames]
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from SpectrumAnalyzer import BandMapper, FFTStage
+
+CHUNK = 1024
+SAMPLE_RATE = 48000
+FREQUENCY_BINS = [64, 128, 256, 512, 1000, 2000, 4000, 8000, 16000, 22000]
+
+def legacy_frame(data):
+    # audio_processing_thread before the FFT stage
+    window = np.hamming(len(data))
+    data = data * window
+    spectrum = np.fft.fft(data)[:CHUNK // 2]
+    amplitude = np.abs(spectrum)
+    splits = [1, 3, 5, 10, 18, 37, 73, 146, 293]
+    inter_amplitude = np.split(amplitude, splits)
+    return np.array([part.sum()/(len(part)**(1/5)) for part in inter_amplitude])
+
+def make_pipeline_frame():
+    fft_stage = FFTStage()
+    band_mapper = BandMapper(SAMPLE_RATE, CHUNK, FREQUENCY_BINS)
+    def pipeline_frame(data):
+        return band_mapper.reduce(fft_stage.process(data))
+    return pipeline_frame
+
+def frames_per_second(frame_func, blocks, frames):
+    frame_func(blocks[0])  # warm caches
+    start = time.perf_counter()
+    for i in range(frames):
+        frame_func(blocks[i % len(blocks)])
+    return frames / (time.perf_counter() - start)
+
+def bytes_per_frame(frame_func, blocks, frames):
+    """Returns (peak transient bytes, retained bytes) per frame as seen by tracemalloc"""
+    frame_func(blocks[0])
+    tracemalloc.start()
+    peak_total = 0
+    base, _ = tracemalloc.get_traced_memory()
+    for i in range(frames):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        frame_func(blocks[i % len(blocks)])
+        _, peak = tracemalloc.get_traced_memory()
+        peak_total += peak - before
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak_total / frames, (current - base) / frames
+
+def main(frames=5000):
+    rng = np.random.default_rng(0)
+    blocks = [(rng.standard_normal(CHUNK) * 3000).astype(np.int16) for _ in range(16)]
+
+    for name, frame_func in (("before", legacy_frame), ("after", make_pipeline_frame())):
+        fps = frames_per_second(frame_func, blocks, frames)
+        peak, retained = bytes_per_frame(frame_func, blocks, min(frames, 1000))
+        print(f"{name:>6}: {fps:10.0f} frames/sec  {peak:9.0f} bytes allocated/frame  {retained:6.1f} bytes retained/frame")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,101 @@
+"""
+Latency of handing a phrase to Whisper on each transcription pass, model time excluded (the same for both).
+
+Before: the chunk is appended to the phrase bytes, the whole phrase is written to a temp WAV (with a new
+PyAudio() for its sample width) and decoded by ffmpeg, what whisper.load_audio does with a file. Now: the
+chunk is converted to 16KHz mono once by a StreamConverter and appended to a PhraseBuffer, whose view goes to
+the model as is.
+
+Run from the repo root: python -m benchmarks.handoff_benchmark [seconds of phrase] [passes]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from AudioConversion import MODEL_SAMPLE_RATE, StreamConverter
+from PhraseBuffer import PhraseBuffer
+
+SAMPLE_RATE = 48000
+CHANNELS = 2
+CHUNK_SECONDS = 3  # AudioRecorder.RECORD_TIMEOUT, what each pass adds to the phrase
+
+try:
+    import pyaudiowpatch as pyaudio
+except ImportError:
+    pyaudio = None
+
+def legacy_handoff(phrase, chunk, with_ffmpeg):
+    # AudioTranscriber.update_last_sample_and_phrase_status + process_speaker_data + whisper.load_audio
+    phrase += chunk
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(CHANNELS)
+            if pyaudio is not None:
+                p = pyaudio.PyAudio()
+                wf.setsampwidth(p.get_sample_size(pyaudio.paInt16))
+                p.terminate()
+            else:
+                wf.setsampwidth(2)
+            wf.setframerate(SAMPLE_RATE)
+            wf.writeframes(phrase)
+        if not with_ffmpeg:
+            return None
+        out = subprocess.run(["ffmpeg", "-nostdin", "-threads", "0", "-i", path, "-f", "s16le", "-ac", "1",
+                              "-acodec", "pcm_s16le", "-ar", str(MODEL_SAMPLE_RATE), "-"],
+                             capture_output=True, check=True).stdout
+        return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+    finally:
+        os.unlink(path)
+
+def current_handoff(state, chunk):
+    # AudioTranscriber.update_last_sample_and_phrase_status + transcribe
+    converter, phrase = state
+    phrase.append(converter.process(np.frombuffer(chunk, dtype=np.int16)))
+    return phrase.view()
+
+def ms_per_pass(setup, handoff, chunk, passes):
+    handoff(setup(), chunk)  # warm caches
+    total = 0.0
+    for _ in range(passes):
+        state = setup()  # the phrase so far, not timed
+        start = time.perf_counter()
+        handoff(state, chunk)
+        total += time.perf_counter() - start
+    return total / passes * 1000
+
+def main(seconds=9.0, passes=20):
+    rng = np.random.default_rng(0)
+    chunk_seconds = min(CHUNK_SECONDS, seconds)
+    pcm = (rng.standard_normal(int(seconds * SAMPLE_RATE) * CHANNELS) * 3000).astype(np.int16)
+    split = len(pcm) - int(chunk_seconds * SAMPLE_RATE) * CHANNELS
+    earlier, chunk = pcm[:split], pcm[split:].tobytes()
+    with_ffmpeg = shutil.which("ffmpeg") is not None
+    if not with_ffmpeg:
+        print("[INFO] ffmpeg not found, the old path is timed without its decode and resampling step (a lower bound)")
+    if pyaudio is None:
+        print("[INFO] pyaudiowpatch not found, the old path is timed without its PyAudio() init (a lower bound)")
+
+    def current_phrase():
+        converter, phrase = StreamConverter(SAMPLE_RATE, CHANNELS), PhraseBuffer()
+        phrase.append(converter.process(earlier))
+        return converter, phrase
+
+    before = ms_per_pass(lambda: earlier.tobytes(), lambda phrase, chunk: legacy_handoff(phrase, chunk, with_ffmpeg),
+                         chunk, passes)
+    after = ms_per_pass(current_phrase, current_handoff, chunk, passes)
+    print(f"{seconds:.1f} s phrases, {chunk_seconds:.1f} s chunks at {SAMPLE_RATE} Hz x {CHANNELS}")
+    print(f"before: {before:8.2f} ms/pass (bytes +=, temp WAV{', PyAudio()' if pyaudio else ''}"
+          f"{' + ffmpeg' if with_ffmpeg else ''})")
+    print(f" after: {after:8.2f} ms/pass (chunk converted once into a PhraseBuffer)")
+    print(f" saved: {before - after:8.2f} ms/pass")
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 9.0, int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,208 @@
+"""
+Headless capture -> FFT -> VAD -> Whisper pipeline, without Tk or matplotlib.
+
+Streams EQ band levels and transcript changes as JSON lines to stdout or a file, e.g.
+    python headless.py --decimate 10 --output run.jsonl
+    python headless.py --no-transcribe --duration 30    # spectrum only, ends with a summary line for CI
+    python headless.py --source file:speech.flac --no-realtime    # replay a file as fast as possible
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from datetime import timezone
+
+import StartupProfiler
+from StartupProfiler import profiler  # first, so --profile-startup times include every import
+import numpy as np
+
+import AudioRecorder
+from CaptureEngine import CaptureEngine
+from PauseSignal import PauseSignal
+import CaptureBackends
+import AudioTranscriber
+import SpectrumAnalyzer
+from SpectrumAnalyzer import SpectrumPipeline, CHUNK, FFT_SIZE, HOP_SIZE, MAX_LEVEL
+
+class JsonLinesWriter:
+    """Thread-safe JSON lines output, one object per line, flushed so consumers see events live"""
+    def __init__(self, file):
+        self.file = file
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, separators=(',', ':'))
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+class HeadlessPipeline:
+    def __init__(self, writer, capture, channel_mode='downmix', bars=None, octave_fraction=None, weighting='flat',
+                 decimate=1, raw=False, transcribe=True, use_api=False, transcriber_options=None, mic=False):
+        self.writer = writer
+        self.decimate = max(decimate, 1)
+        self.raw = raw
+        self.frames = 0
+        self.stop_event = threading.Event()
+        self.capture_ended = threading.Event()
+        # set once everything a finite source captured is transcribed, or there's no transcription
+        self.transcription_done = threading.Event()
+
+        self.capture = capture
+        self.capture_reader = capture.reader("spectrum")
+        self.transcription_reader = capture.reader("transcription") if transcribe else None
+        self.sample_rate = capture.sample_rate
+        self.spectrum = SpectrumPipeline(self.sample_rate, capture.channels, channel_mode,
+                                         bars, octave_fraction, FFT_SIZE, HOP_SIZE, weighting)
+        self.writer.write({"type": "start", "time": time.time(), "sample_rate": self.sample_rate,
+                           "hop_seconds": HOP_SIZE / self.sample_rate, "decimate": self.decimate,
+                           "frequency_bins": [float(f) for f in self.spectrum.frequency_bins],
+                           "labels": self.spectrum.labels})
+        # started once the readers are attached, so they see a replayed file from the first frame
+        self.capture.start()
+
+        self.transcriber = None
+        if not transcribe:
+            self.transcription_done.set()
+        else:
+            # spectrum frames flow while the model loads, status lines tell consumers when transcripts can come
+            threading.Thread(target=self.start_transcriber, args=(use_api, transcriber_options, mic),
+                             daemon=True).start()
+
+    def status(self, status, **details):
+        self.writer.write({"type": "status", "time": time.time(), "status": status, **details})
+
+    def start_transcriber(self, use_api, options=None, mic=False):
+        try:
+            # imported here so spectrum-only runs don't need whisper / torch
+            import TranscriberModels
+
+            audio_queue = queue.Queue()
+            pause_transcribe = PauseSignal()
+            self.status("calibrating")
+            recorders = AudioRecorder.open_recorders(self.transcription_reader, mic)
+            if mic and len(recorders) == 1:
+                self.status("mic unavailable")
+            self.status("loading")
+            model = TranscriberModels.get_model(use_api)
+            self.transcriber = AudioTranscriber.AudioTranscriber(model, **(options or {}))
+            # recording starts only once there's a model, nothing fills the queue if loading fails
+            AudioRecorder.start_recording(recorders, self.transcriber, audio_queue, pause_transcribe)
+        except Exception as e:
+            self.status("unavailable", error=str(e))
+            self.transcription_reader.close()  # a replay mustn't wait for it
+            self.transcription_done.set()
+            return
+        self.status("ready")
+        threading.Thread(target=self.transcriber.transcribe_audio_queue, args=(audio_queue, pause_transcribe),
+                         daemon=True).start()
+        threading.Thread(target=self.transcript_thread, daemon=True).start()
+
+        # a replay ends the run only once the transcriber has caught up with everything it captured
+        for recorder in recorders:
+            if isinstance(recorder.source, AudioRecorder.CaptureSource):
+                recorder.finished.wait()
+        audio_queue.join()
+        self.transcription_done.set()
+
+    def spectrum_thread(self):
+        while not self.stop_event.is_set():
+            data = self.capture_reader.read(CHUNK)
+            if data is None:
+                self.capture_ended.set()
+                break
+            for bands, state in self.spectrum.process(data):
+                self.frames += 1
+                profiler.mark("first_frame")
+                if self.frames % self.decimate:
+                    continue
+                record = {"type": "spectrum", "time": time.time(), "frame": self.frames}
+                if self.raw:
+                    # float64 before rounding, float32 values print with all their digits in JSON
+                    record["bands"] = np.minimum(bands, MAX_LEVEL, dtype=np.float64).round(1).tolist()
+                else:
+                    levels, peaks = np.minimum(state, MAX_LEVEL, dtype=np.float64).round(1)
+                    record["levels"], record["peaks"] = levels.tolist(), peaks.tolist()
+                self.writer.write(record)
+
+    def transcript_thread(self):
+        while not self.stop_event.is_set():
+            self.transcriber.transcript_changed_event.wait()
+            self.transcriber.transcript_changed_event.clear()
+            self.write_transcript_changes()
+
+    def write_transcript_changes(self):
+        for change in self.transcriber.pop_transcript_changes():
+            record = {"type": "transcript", "time": time.time(), "op": change[0], "lag": self.transcriber.lag}
+            if len(change) > 1:
+                record["id"] = change[1]
+            if len(change) > 2:
+                record["text"] = change[2].strip()
+                record["source"] = change[3]
+                record["started"] = change[4].replace(tzinfo=timezone.utc).timestamp()
+                profiler.mark("first_transcript")
+            self.writer.write(record)
+
+    def run(self, duration=None):
+        start = time.perf_counter()
+        threading.Thread(target=self.spectrum_thread, daemon=True).start()
+        try:
+            if self.capture_ended.wait(duration):
+                # a finite source ended, let transcription finish within what's left of the duration
+                self.transcription_done.wait(None if duration is None else
+                                             max(duration - (time.perf_counter() - start), 0))
+        except KeyboardInterrupt:
+            pass
+        self.stop_event.set()
+        if self.transcriber is not None:
+            self.write_transcript_changes()
+        elapsed = time.perf_counter() - start
+        summary = {"type": "summary", "time": time.time(), "elapsed": elapsed, "frames": self.frames,
+                   "frames_per_sec": self.frames / elapsed if elapsed else 0.0,
+                   "capture_overruns": self.capture_reader.overruns,
+                   "capture_lost_frames": self.capture_reader.lost_frames}
+        if self.transcriber is not None:
+            summary["transcription_lag"] = self.transcriber.lag
+            summary["skipped_chunks"] = self.transcriber.skipped_chunks
+        self.writer.write(summary)
+        self.capture.close()
+        profiler.finish()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Headless EQ + transcription pipeline, JSON lines output")
+    parser.add_argument('--output', help="file to write JSON lines to, stdout by default")
+    parser.add_argument('--decimate', type=int, default=1, metavar='N', help="emit every Nth spectrum frame")
+    parser.add_argument('--raw', action='store_true', help="emit unsmoothed band levels instead of levels + peaks")
+    parser.add_argument('--duration', type=float, help="stop after this many seconds")
+    parser.add_argument('--no-transcribe', action='store_true', help="spectrum only")
+    parser.add_argument('--api', action='store_true', help="transcribe with the whisper API")
+    parser.add_argument('--record', metavar='FILE', help="also write the captured audio to a WAV file")
+    StartupProfiler.add_arguments(parser)
+    SpectrumAnalyzer.add_arguments(parser)
+    CaptureBackends.add_arguments(parser)
+    AudioTranscriber.add_arguments(parser)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.profile_startup:
+        profiler.enable(args.profile_startup)
+        profiler.mark("imports")
+    output = open(args.output, 'w') if args.output else sys.stdout
+    # everything else printing (recorders, whisper, speech_recognition) goes to stderr, stdout is JSON lines only
+    sys.stdout = sys.stderr
+    with profiler.phase("capture open"):
+        capture = CaptureEngine(CaptureBackends.from_args(args, CHUNK), CHUNK)
+    if args.record:
+        capture.record(args.record)
+    try:
+        pipeline = HeadlessPipeline(JsonLinesWriter(output), capture, **SpectrumAnalyzer.options_from_args(args),
+                                    decimate=args.decimate, raw=args.raw, transcribe=not args.no_transcribe,
+                                    use_api=args.api,
+                                    transcriber_options=AudioTranscriber.options_from_args(args), mic=args.mic)
+        pipeline.run(args.duration)
+    finally:
+        if args.output:
+            output.close()
@@ -0,0 +1,53 @@
+import itertools
+import numpy as np
+import pytest
+
+from AudioConversion import MODEL_SAMPLE_RATE, Resampler, to_model_input
+
+def tone(frequency, sample_rate, seconds):
+    return np.sin(2 * np.pi * frequency * np.arange(int(sample_rate * seconds)) / sample_rate).astype(np.float32)
+
+def one_shot(from_rate, samples):
+    resampler = Resampler(from_rate)
+    return np.concatenate((resampler.process(samples), resampler.flush()))
+
+# 11025Hz has more phases than RESAMPLE_PHASES and takes the quantized table
+@pytest.mark.parametrize("from_rate", [48000, 44100, 22050, 11025])
+def test_streaming_matches_one_shot(from_rate):
+    samples = np.random.default_rng(0).uniform(-1, 1, from_rate).astype(np.float32)
+    expected = one_shot(from_rate, samples)
+    assert abs(len(expected) - len(samples) * MODEL_SAMPLE_RATE / from_rate) <= 1
+
+    resampler = Resampler(from_rate)
+    blocks, offset = [], 0
+    for size in itertools.cycle([1, 7, 441, 1024, 4800]):
+        if offset >= len(samples):
+            break
+        blocks.append(resampler.process(samples[offset:offset + size]))
+        offset += size
+    blocks.append(resampler.flush())
+    np.testing.assert_allclose(np.concatenate(blocks), expected, atol=1e-6)
+
+@pytest.mark.parametrize("from_rate", [48000, 44100])
+def test_tone_survives_resampling(from_rate):
+    out = one_shot(from_rate, tone(1000, from_rate, 1))
+    expected = tone(1000, MODEL_SAMPLE_RATE, 1)
+    # away from the zero padded ends
+    np.testing.assert_allclose(out[100:-100], expected[100:len(out) - 100], atol=1e-2)
+
+def test_above_model_nyquist_is_filtered():
+    out = one_shot(48000, tone(12000, 48000, 1))
+    assert np.abs(out[100:-100]).max() < 1e-2
+
+def test_same_rate_passes_through():
+    samples = tone(440, MODEL_SAMPLE_RATE, 0.1)
+    resampler = Resampler(MODEL_SAMPLE_RATE)
+    assert resampler.process(samples) is samples
+    assert len(resampler.flush()) == 0
+
+def test_model_input_downmixes_interleaved_pcm():
+    left = (tone(1000, 48000, 0.5) * 16384).astype(np.int16)
+    pcm = np.stack((left, left), axis=-1).ravel()
+    out = to_model_input(pcm, 48000, 2)
+    np.testing.assert_allclose(out[100:-100], 0.5 * tone(1000, MODEL_SAMPLE_RATE, 0.5)[100:len(out) - 100],
+                               atol=1e-2)
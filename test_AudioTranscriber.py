@@ -0,0 +1,242 @@
+import queue
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+
+import AudioTranscriber
+from AudioConversion import MODEL_SAMPLE_RATE
+from PauseSignal import PauseSignal
+
+CHUNK_SECONDS = 3  # AudioRecorder.RECORD_TIMEOUT
+
+class Source:
+    SAMPLE_RATE = MODEL_SAMPLE_RATE
+    SAMPLE_WIDTH = 2
+    channels = 1
+
+    def __init__(self, latest=None):
+        self.now = latest
+
+    def latest(self):
+        return self.now or datetime.utcnow()
+
+class Model:
+    """Stand-in for TranscriberModels, records how much audio each pass decodes"""
+    def __init__(self, text=""):
+        self.text = text
+        self.passes = []
+
+    def get_segments(self, audio, fast=False):
+        self.passes.append(len(audio) / MODEL_SAMPLE_RATE)
+        if not self.text:
+            return []
+        # one segment per second of audio
+        return [(i, i + 1, f" {self.text}") for i in range(int(len(audio) / MODEL_SAMPLE_RATE))]
+
+    def get_words(self, audio, prompt, fast=False):
+        # run writes the centisecond each sample was captured at into it, a word starts every half second
+        self.passes.append(len(audio) / MODEL_SAMPLE_RATE)
+        if not self.text:
+            return []
+        start = round(audio[0] * 32768) / 100
+        end = start + len(audio) / MODEL_SAMPLE_RATE
+        words = []
+        for k in range(int(start * 2), int(end * 2) + 1):
+            if k / 2 >= start - 0.05 and k / 2 + 0.4 <= end:
+                text = f" w{k}." if self.text == "sentences" and k % 10 == 9 else f" w{k}"
+                words.append((k / 2 - start, k / 2 + 0.4 - start, text))
+        return words
+
+def run(transcriber, seconds, who="Speaker", chunk_seconds=CHUNK_SECONDS):
+    """Feeds ``seconds`` of back to back chunks the way the worker does, one pass per chunk"""
+    start = datetime(2024, 1, 1)
+    chunk = int(chunk_seconds * MODEL_SAMPLE_RATE)
+    for i in range(int(seconds / chunk_seconds)):
+        samples = np.arange(i * chunk, (i + 1) * chunk)
+        data = (samples * 100 // MODEL_SAMPLE_RATE).astype(np.int16).tobytes()
+        time_spoken = start + timedelta(seconds=(i + 1) * chunk_seconds)
+        transcriber.update_last_sample_and_phrase_status(who, data, time_spoken)
+        transcriber.transcribe(who)
+
+def test_phrase_without_text_stays_within_the_horizon():
+    model = Model()
+    transcriber = AudioTranscriber.AudioTranscriber(model, horizon=20)
+    transcriber.add_source("Speaker", Source())
+    run(transcriber, 300)
+    assert max(model.passes) <= 20 + CHUNK_SECONDS
+    assert transcriber.transcript_data["Speaker"] == []
+
+def test_horizon_shorter_than_the_kept_tail():
+    model = Model()
+    transcriber = AudioTranscriber.AudioTranscriber(model, horizon=1)
+    transcriber.add_source("Speaker", Source())
+    run(transcriber, 30, chunk_seconds=0.8)
+    assert max(model.passes) <= 1 + 0.8
+
+def test_continuous_speech_slides_past_the_horizon():
+    model = Model("la")
+    transcriber = AudioTranscriber.AudioTranscriber(model, horizon=20)
+    transcriber.add_source("Speaker", Source())
+    run(transcriber, 300)
+    assert max(model.passes) <= 20 + CHUNK_SECONDS
+    # finished phrases are committed as the window slides instead of one phrase growing for 300 s
+    assert len(transcriber.transcript_data["Speaker"]) > 1
+
+def streamed_phrases(transcriber):
+    texts = {}
+    for change in transcriber.pop_transcript_changes():
+        if change[0] == "set":
+            texts[change[1]] = change[2].strip()
+    return [texts[phrase_id] for phrase_id in sorted(texts)]
+
+def test_streaming_decodes_a_bounded_tail():
+    model = Model("sentences")
+    transcriber = AudioTranscriber.AudioTranscriber(model, horizon=20, streaming=True)
+    transcriber.add_source("Speaker", Source())
+    run(transcriber, 120)
+    # committed words' audio is dropped, passes don't grow with the phrase
+    assert max(model.passes) < 2 * CHUNK_SECONDS + 1
+    phrases = streamed_phrases(transcriber)
+    assert all(phrase.endswith(".") for phrase in phrases[:-1])
+    # every word once, in order, up to the still tentative end
+    spoken = " ".join(phrases).replace(".", "").split()
+    assert spoken == [f"w{k}" for k in range(len(spoken))]
+    assert len(spoken) > 2 * (120 - 2 * CHUNK_SECONDS)
+
+def test_streaming_without_sentence_ends_finalizes_each_horizon():
+    model = Model("words")
+    transcriber = AudioTranscriber.AudioTranscriber(model, horizon=20, streaming=True)
+    transcriber.add_source("Speaker", Source())
+    run(transcriber, 120)
+    assert max(model.passes) < 2 * CHUNK_SECONDS + 1
+    phrases = streamed_phrases(transcriber)
+    # two words a second, a phrase is finalized once it spans more than the horizon
+    assert len(phrases) >= 5
+    assert all(len(phrase.split()) <= 2 * (20 + CHUNK_SECONDS) for phrase in phrases)
+    spoken = " ".join(phrases).split()
+    assert spoken == [f"w{k}" for k in range(len(spoken))]
+
+def test_streaming_without_words_stays_within_the_horizon():
+    model = Model()
+    transcriber = AudioTranscriber.AudioTranscriber(model, horizon=20, streaming=True)
+    transcriber.add_source("Speaker", Source())
+    run(transcriber, 120)
+    assert max(model.passes) <= 20 + CHUNK_SECONDS
+
+class FailingModel(Model):
+    def get_segments(self, audio, fast=False):
+        if not self.passes:
+            self.passes.append(len(audio) / MODEL_SAMPLE_RATE)
+            raise RuntimeError("decoder failed")
+        return super().get_segments(audio, fast)
+
+def test_a_failed_pass_doesnt_stop_the_worker():
+    model = FailingModel("hello")
+    transcriber = AudioTranscriber.AudioTranscriber(model)
+    transcriber.add_source("Speaker", Source())
+    audio_queue = queue.Queue()
+    threading.Thread(target=transcriber.transcribe_audio_queue, args=(audio_queue, PauseSignal()),
+                     daemon=True).start()
+    data = np.zeros(MODEL_SAMPLE_RATE, dtype=np.int16).tobytes()
+    audio_queue.put(("Speaker", data, datetime.utcnow()))
+    audio_queue.join()
+    audio_queue.put(("Speaker", data, datetime.utcnow()))
+    audio_queue.join()
+    assert len(model.passes) == 2
+    assert "hello" in transcriber.get_transcript()
+
+class RecordingModel(Model):
+    """Returns the source's name plus how many seconds it was given, and records the fast flag"""
+    def __init__(self):
+        super().__init__()
+        self.fast = []
+
+    def get_segments(self, audio, fast=False):
+        super().get_segments(audio, fast)
+        self.fast.append(fast)
+        return [(0, 1, f" {len(audio) / MODEL_SAMPLE_RATE:g}s")]
+
+NOW = datetime(2024, 1, 1, 12)
+
+def chunk(who, seconds_ago, level=1000, seconds=1):
+    return (who, np.full(int(seconds * MODEL_SAMPLE_RATE), level, dtype=np.int16).tobytes(),
+            NOW - timedelta(seconds=seconds_ago))
+
+def two_sources(**options):
+    model = RecordingModel()
+    transcriber = AudioTranscriber.AudioTranscriber(model, max_lag=10, **options)
+    transcriber.add_source("Speaker", Source(NOW))
+    transcriber.add_source("You", Source(NOW))
+    return model, transcriber
+
+def test_batch_gets_one_pass_per_source():
+    model, transcriber = two_sources()
+    transcriber.transcribe_batch([chunk("Speaker", 3), chunk("You", 3), chunk("Speaker", 2), chunk("Speaker", 1)])
+    assert model.passes == [3, 1]
+    assert transcriber.lag == 3
+    assert [text for text, _, _ in transcriber.transcript_data["Speaker"]] == ["Speaker: 3s\n\n"]
+
+def test_unknown_sources_are_ignored():
+    model, transcriber = two_sources()
+    transcriber.transcribe_batch([chunk("Other", 1), chunk("You", 1)])
+    assert model.passes == [1]
+
+def test_skip_policy_drops_the_stale_chunks():
+    model, transcriber = two_sources()
+    transcriber.transcribe_batch([chunk("Speaker", 40)])
+    # a recent mic chunk first, then the speaker's backlog, only the speaker's stale phrase ends
+    transcriber.transcribe_batch([chunk("You", 2), chunk("Speaker", 30), chunk("Speaker", 5)])
+    assert transcriber.skipped_chunks == 1
+    assert model.passes == [1, 1, 1]
+    assert not model.fast[-1]
+
+def test_skip_policy_keeps_a_source_that_isnt_behind():
+    model, transcriber = two_sources()
+    transcriber.transcribe_batch([chunk("You", 3)])
+    transcriber.transcribe_batch([chunk("You", 2), chunk("Speaker", 30)])
+    assert transcriber.skipped_chunks == 1
+    assert len(transcriber.audio_sources["You"]["last_sample"]) == 2 * MODEL_SAMPLE_RATE
+    assert len(transcriber.audio_sources["Speaker"]["last_sample"]) == 0
+
+def test_skip_policy_keeps_the_newest_chunk_when_everything_is_stale():
+    model, transcriber = two_sources()
+    transcriber.transcribe_batch([chunk("Speaker", 30), chunk("Speaker", 29)])
+    assert transcriber.skipped_chunks == 1
+    assert model.passes == [1]
+
+def test_fast_policy_keeps_everything_and_decodes_fast():
+    model, transcriber = two_sources(lag_policy="fast")
+    transcriber.transcribe_batch([chunk("Speaker", 30), chunk("Speaker", 29)])
+    assert transcriber.skipped_chunks == 0
+    assert model.passes == [2] and model.fast == [True]
+
+def test_drop_silence_policy_drops_quiet_chunks():
+    model, transcriber = two_sources(lag_policy="drop-silence")
+    transcriber.transcribe_batch([chunk("Speaker", 30, level=10), chunk("Speaker", 29), chunk("Speaker", 28, level=0)])
+    assert transcriber.skipped_chunks == 2
+    assert model.passes == [1] and model.fast == [False]
+
+def test_policies_wait_for_max_lag():
+    model, transcriber = two_sources(lag_policy="drop-silence")
+    transcriber.transcribe_batch([chunk("Speaker", 9, level=0), chunk("Speaker", 8)])
+    assert transcriber.skipped_chunks == 0
+    assert model.passes == [2]
+
+def test_phrases_merge_by_when_they_started():
+    model, transcriber = two_sources()
+    # the speaker's 3 s chunk started before the mic's short one but ended after it
+    transcriber.transcribe_batch([chunk("You", 2, seconds=0.5), chunk("Speaker", 0, seconds=3)])
+    assert transcriber.get_transcript() == "Speaker: 3s\n\nYou: 0.5s\n\n"
+    started = {who: entries[0][1] for who, entries in transcriber.transcript_data.items()}
+    assert started == {"Speaker": NOW - timedelta(seconds=3), "You": NOW - timedelta(seconds=2.5)}
+
+def test_single_source_has_no_labels():
+    model = RecordingModel()
+    transcriber = AudioTranscriber.AudioTranscriber(model)
+    transcriber.add_source("Speaker", Source(NOW))
+    transcriber.transcribe_batch([chunk("Speaker", 10)])
+    transcriber.transcribe_batch([chunk("Speaker", 1)])
+    # a pause ends the first phrase, the newest phrase comes last
+    assert transcriber.get_transcript() == "1s\n\n1s\n\n"
+    assert [entry[1] for entry in transcriber.transcript_data["Speaker"]] == [NOW - timedelta(seconds=2),
+                                                                             NOW - timedelta(seconds=11)]
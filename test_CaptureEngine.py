@@ -0,0 +1,71 @@
+import numpy as np
+
+from CaptureEngine import CaptureEngine
+
+class RampBackend:
+    """``total`` stereo frames, both channels holding the frame number"""
+    sample_rate = 1000
+    channels = 2
+
+    def __init__(self, total, live=False):
+        self.total = total
+        self.live = live
+        self.frames = 0
+
+    def read(self, frames):
+        frames = min(frames, self.total - self.frames)
+        data = np.repeat(np.arange(self.frames, self.frames + frames, dtype=np.int16), 2)
+        self.frames += frames
+        return data.tobytes()
+
+    def close(self):
+        pass
+
+def ramp(start, frames):
+    return np.repeat(np.arange(start, start + frames, dtype=np.int16), 2)
+
+def read_all(reader, frames):
+    out = []
+    while (samples := reader.read(frames)) is not None:
+        out.append(samples.copy())
+    return np.concatenate(out)
+
+def test_readers_have_independent_cursors():
+    engine = CaptureEngine(RampBackend(2500, live=True), chunk=100, ring_seconds=10)
+    first, second = engine.reader("first"), engine.reader("second")
+    engine.start().thread.join()
+    np.testing.assert_array_equal(read_all(first, 100), ramp(0, 2500))
+    np.testing.assert_array_equal(read_all(second, 333), ramp(0, 2500))
+    assert first.overruns == second.overruns == 0
+
+def test_slow_reader_of_a_live_capture_overruns():
+    engine = CaptureEngine(RampBackend(0, live=True), chunk=100, ring_seconds=1)
+    reader = engine.reader("slow")
+    for start in range(0, 1500, 100):
+        engine.write(ramp(start, 100))
+    # 1500 frames written into a 1000 frame ring, the oldest 500 are gone
+    np.testing.assert_array_equal(reader.read(100), ramp(500, 100))
+    assert (reader.overruns, reader.lost_frames, reader.position()) == (1, 500, 600)
+    assert reader.available() == 900
+
+def test_lossless_capture_waits_for_slow_readers():
+    engine = CaptureEngine(RampBackend(5000), chunk=100, ring_seconds=1)
+    reader = engine.reader("slow")
+    engine.start()
+    np.testing.assert_array_equal(read_all(reader, 70), ramp(0, 5000))
+    assert reader.overruns == reader.lost_frames == 0
+
+def test_drained_reader_gets_a_short_read_then_none():
+    engine = CaptureEngine(RampBackend(250), chunk=100)
+    reader = engine.reader("drain")
+    engine.start()
+    assert len(reader.read(200)) == 400
+    np.testing.assert_array_equal(reader.read(200), ramp(200, 50))
+    assert reader.read(200) is None
+
+def test_closed_reader_no_longer_holds_back_a_lossless_capture():
+    engine = CaptureEngine(RampBackend(5000), chunk=100, ring_seconds=1)
+    idle, reader = engine.reader("idle"), engine.reader("active")
+    engine.start()
+    idle.close()
+    assert len(read_all(reader, 100)) == 2 * 5000
@@ -0,0 +1,45 @@
+import numpy as np
+
+from FrameExchange import FrameExchange
+
+def test_take_returns_the_newest_frame_once():
+    exchange = FrameExchange((2, 3))
+    assert exchange.take() is None
+    exchange.publish(np.full((2, 3), 1.0))
+    np.testing.assert_array_equal(exchange.take(), np.full((2, 3), 1.0))
+    # nothing new since, the caller skips the redraw
+    assert exchange.take() is None
+    assert (exchange.dropped, exchange.duplicated) == (0, 2)
+
+def test_frames_never_taken_count_as_dropped():
+    exchange = FrameExchange((3,))
+    for value in range(4):
+        exchange.publish(np.full(3, value))
+    np.testing.assert_array_equal(exchange.take(), np.full(3, 3))
+    assert exchange.dropped == 3
+    exchange.publish(np.full(3, 4))
+    exchange.take()
+    assert (exchange.dropped, exchange.duplicated) == (3, 0)
+
+def test_taken_frame_is_a_copy():
+    exchange = FrameExchange((3,))
+    frame = np.arange(3, dtype=np.float32)
+    exchange.publish(frame)
+    frame[:] = 9
+    taken = exchange.take()
+    np.testing.assert_array_equal(taken, [0, 1, 2])
+    exchange.publish(np.full(3, 5))
+    # the reader's buffer only changes on its next take
+    np.testing.assert_array_equal(taken, [0, 1, 2])
+    assert exchange.take() is taken
+
+def test_publish_clips_to_max_value():
+    exchange = FrameExchange((3,))
+    exchange.publish(np.array([1.0, 50.0, 100.0]), max_value=10)
+    np.testing.assert_array_equal(exchange.take(), [1, 10, 10])
+
+def test_age_since_the_last_publish():
+    exchange = FrameExchange((1,))
+    assert exchange.age() is None
+    exchange.publish(np.zeros(1))
+    assert 0 <= exchange.age() < 1
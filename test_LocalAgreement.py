@@ -0,0 +1,75 @@
+from LocalAgreement import LocalAgreement, PROMPT_CHARS
+
+def words(*texts, start=0.0, step=0.5):
+    return [(start + i * step, start + i * step + 0.4, f" {text}") for i, text in enumerate(texts)]
+
+def test_two_agreeing_passes_commit_their_common_prefix():
+    agreement = LocalAgreement()
+    assert agreement.insert(words("one", "two", "three"), 0.0) == []
+    assert agreement.text() == "one two three"
+
+    committed = agreement.insert(words("one", "two", "tree", "four"), 0.0)
+    assert [word for _, _, word in committed] == [" one", " two"]
+    assert [word for _, _, word in agreement.tentative] == [" tree", " four"]
+    assert agreement.committed_end == 0.9
+    assert agreement.text() == "one two tree four"
+
+def test_agreement_ignores_case_and_punctuation():
+    agreement = LocalAgreement()
+    agreement.insert(words("Hello", "world"), 0.0)
+    assert len(agreement.insert(words("hello,", "World."), 0.0)) == 2
+
+def test_later_passes_only_add_words_after_the_committed_end():
+    agreement = LocalAgreement()
+    agreement.insert(words("one", "two", "three"), 0.0)
+    agreement.insert(words("one", "two", "three"), 0.0)
+    # the audio of the committed words is dropped, the next pass starts at its end
+    agreement.insert(words("four", "five"), 1.4)
+    committed = agreement.insert(words("four", "five", "six"), 1.4)
+    assert agreement.text() == "one two three four five six"
+    assert [word for _, _, word in committed] == [" four", " five"]
+
+def test_repeated_committed_words_are_skipped():
+    agreement = LocalAgreement()
+    agreement.insert(words("one", "two"), 0.0)
+    agreement.insert(words("one", "two"), 0.0)
+    # the prompt made the decoder repeat "two" at the start of the new audio
+    agreement.insert(words("two", "three"), 0.9)
+    assert agreement.text() == "one two three"
+
+def test_words_before_the_committed_end_are_dropped():
+    agreement = LocalAgreement()
+    agreement.insert(words("one", "two"), 0.0)
+    agreement.insert(words("one", "two"), 0.0)
+    agreement.insert(words("uh", "three", start=0.5), 0.0)
+    assert agreement.text() == "one two three"
+
+def test_force_commits_all_but_the_last_words():
+    agreement = LocalAgreement()
+    agreement.insert(words("a", "b", "c"), 0.0)
+    assert [word for _, _, word in agreement.force()] == [" a", " b"]
+    assert [word for _, _, word in agreement.tentative] == [" c"]
+    assert agreement.force(keep=0)[-1][2] == " c"
+
+def test_finalize_splits_at_the_last_sentence_end():
+    agreement = LocalAgreement()
+    agreement.commit(words("Hi.", "How", "are", "you?", "I'm"))
+    assert agreement.finalize() == "Hi. How are you?"
+    assert agreement.text() == "I'm"
+    assert agreement.finalize() == ""
+
+def test_finalize_without_punctuation_waits_for_max_span():
+    agreement = LocalAgreement()
+    agreement.commit(words(*"the music goes on and on".split()))
+    assert agreement.finalize(max_span=5) == ""
+    assert agreement.finalize(max_span=2) == "the music goes on and on"
+    assert agreement.committed == []
+
+def test_prompt_keeps_only_the_latest_committed_text():
+    agreement = LocalAgreement()
+    agreement.commit(words(*(f"word{i}." for i in range(200))))
+    agreement.finalize()
+    assert len(agreement.prompt()) <= PROMPT_CHARS
+    assert agreement.prompt().endswith("word199.")
+    agreement.reset()
+    assert agreement.prompt() == "" and agreement.text() == ""
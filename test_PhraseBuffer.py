@@ -0,0 +1,52 @@
+import numpy as np
+
+from PhraseBuffer import PhraseBuffer
+
+def test_growing_keeps_earlier_samples():
+    phrase = PhraseBuffer(capacity=4)
+    for start in range(0, 100, 7):
+        phrase.append(np.arange(start, start + 7, dtype=np.float32))
+    assert len(phrase) == 105
+    np.testing.assert_array_equal(phrase.view(), np.arange(105))
+    # doubled, not grown to fit each append
+    assert len(phrase.buffer) == 128
+
+def test_view_is_zero_copy():
+    phrase = PhraseBuffer(capacity=16)
+    phrase.append(np.ones(8, dtype=np.float32))
+    view = phrase.view()
+    assert np.shares_memory(view, phrase.buffer)
+    # appending within capacity doesn't move what the view covers
+    phrase.append(np.zeros(8, dtype=np.float32))
+    np.testing.assert_array_equal(view, np.ones(8))
+
+def test_clear_keeps_capacity():
+    phrase = PhraseBuffer(capacity=4)
+    phrase.append(np.ones(20, dtype=np.float32))
+    buffer = phrase.buffer
+    phrase.clear()
+    assert len(phrase) == 0 and len(phrase.view()) == 0
+    phrase.append(np.full(10, 2, dtype=np.float32))
+    assert phrase.buffer is buffer
+    np.testing.assert_array_equal(phrase.view(), np.full(10, 2))
+
+def test_drop_front_keeps_the_newest_samples():
+    phrase = PhraseBuffer(capacity=8)
+    phrase.append(np.arange(10, dtype=np.float32))
+    phrase.drop_front(4)
+    np.testing.assert_array_equal(phrase.view(), np.arange(4, 10))
+    phrase.append(np.arange(10, 12, dtype=np.float32))
+    np.testing.assert_array_equal(phrase.view(), np.arange(4, 12))
+
+def test_drop_front_edge_counts():
+    phrase = PhraseBuffer(capacity=8)
+    phrase.append(np.arange(6, dtype=np.float32))
+    phrase.drop_front(0)
+    assert len(phrase) == 6
+    phrase.drop_front(-3)
+    np.testing.assert_array_equal(phrase.view(), np.arange(6))
+    phrase.drop_front(6)
+    assert len(phrase) == 0
+    phrase.append(np.arange(3, dtype=np.float32))
+    phrase.drop_front(100)
+    assert len(phrase) == 0
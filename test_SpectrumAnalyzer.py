@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from SpectrumAnalyzer import BandMapper, BarSmoother, DEFAULT_FREQUENCY_BINS, STFTBuffer, bar_layout
+
+def naive_bars(amplitude, mapper):
+    # per bar loop over the same [start, stop) bin ranges BandMapper precomputes
+    n_bins = mapper.fft_size // 2 + 1
+    bin_hz = mapper.sample_rate / mapper.fft_size
+    edges = [0.0] + mapper.frequency_bins
+    bars = []
+    for i, (lo, hi) in enumerate(zip(edges[:-1], edges[1:])):
+        start = min(max(int(np.rint(lo / bin_hz)), 1), n_bins)
+        stop = min(max(int(np.rint(hi / bin_hz)), 1), n_bins)
+        bars.append(amplitude[start:stop].sum() * mapper.scale[i])
+    return np.array(bars, dtype=np.float32)
+
+def test_wide_bars_sum_their_bins():
+    mapper = BandMapper(48000, 4096, DEFAULT_FREQUENCY_BINS)
+    amplitude = np.random.default_rng(0).random(4096 // 2 + 1).astype(np.float32)
+    np.testing.assert_allclose(mapper.reduce(amplitude), naive_bars(amplitude, mapper), rtol=1e-5)
+
+def test_tone_lands_in_its_bar():
+    mapper = BandMapper(48000, 4096, DEFAULT_FREQUENCY_BINS)
+    amplitude = np.zeros(4096 // 2 + 1, dtype=np.float32)
+    amplitude[int(round(3000 / (48000 / 4096)))] = 1.0
+    bars = mapper.reduce(amplitude)
+    assert np.flatnonzero(bars).tolist() == [DEFAULT_FREQUENCY_BINS.index(4000)]
+
+def test_narrow_bars_are_interpolated():
+    frequency_bins, low_edge, _ = bar_layout(48000, bars=128)
+    mapper = BandMapper(48000, 1024, frequency_bins, low_edge)
+    assert len(mapper.interp_lo) > 0
+    bars = mapper.reduce(np.ones(1024 // 2 + 1, dtype=np.float32))
+    assert np.all(bars > 0)
+
+def test_bars_past_nyquist_stay_zero():
+    # nyquist at 11025Hz, the 22K bar starts at 16K
+    mapper = BandMapper(22050, 4096, DEFAULT_FREQUENCY_BINS)
+    bars = mapper.reduce(np.ones(4096 // 2 + 1, dtype=np.float32))
+    assert bars[-1] == 0 and np.all(bars[:-1] > 0)
+
+def test_leading_axes_reduce_per_channel():
+    mapper = BandMapper(44100, 2048, DEFAULT_FREQUENCY_BINS)
+    amplitude = np.random.default_rng(1).random((2, 2048 // 2 + 1)).astype(np.float32)
+    both = mapper.reduce(amplitude).copy()
+    for channel in range(2):
+        np.testing.assert_allclose(both[channel], mapper.reduce(amplitude[channel]), rtol=1e-6)
+
+def stft_windows(block, fft_size=256, hop=64, total=2000):
+    signal = np.arange(2 * total, dtype=np.float32).reshape(2, total)
+    stft = STFTBuffer(fft_size, hop, n_sets=2)
+    windows = []
+    for offset in range(0, total, block):
+        windows += [window.copy() for window in stft.push(signal[:, offset:offset + block])]
+    return signal, windows
+
+@pytest.mark.parametrize("block", [1, 37, 64, 100, 1000])
+def test_stft_yields_the_latest_window_every_hop(block):
+    signal, windows = stft_windows(block)
+    assert len(windows) == 2000 // 64
+    for i, window in enumerate(windows):
+        end = (i + 1) * 64
+        expected = np.zeros((2, 256), dtype=np.float32)
+        expected[:, max(256 - end, 0):] = signal[:, max(end - 256, 0):end]
+        np.testing.assert_array_equal(window, expected)
+
+@pytest.mark.parametrize("hop", [0, 257])
+def test_stft_rejects_bad_hops(hop):
+    with pytest.raises(ValueError):
+        STFTBuffer(256, hop)
+
+def smoothed_steps(hop_seconds, seconds=2.0, step_down=1.0):
+    """Levels and peaks of one bar for a step up at 0 s and down at ``step_down`` s, keyed by elapsed ms"""
+    smoother = BarSmoother((1, 1), hop_seconds)
+    down = int(round(step_down / hop_seconds))
+    out = {}
+    for hop in range(1, int(round(seconds / hop_seconds)) + 1):
+        levels, peaks = smoother.update(np.full((1, 1), 1.0 if hop <= down else 0.0, dtype=np.float32))
+        out[int(round(hop * hop_seconds * 1000))] = (float(levels[0, 0]), float(peaks[0, 0]))
+    return out
+
+def test_smoothing_is_the_same_at_any_hop():
+    # 480 and 960 samples at 48KHz, 480 at 12KHz
+    fine, coarse, slow = smoothed_steps(480 / 48000), smoothed_steps(960 / 48000), smoothed_steps(480 / 12000)
+    for ms, state in slow.items():
+        np.testing.assert_allclose(coarse[ms], state, atol=1e-5)
+        np.testing.assert_allclose(fine[ms], state, atol=1e-5)
+    # 25 ms attack, 250 ms release
+    np.testing.assert_allclose(slow[40][0], 1 - np.exp(-40 / 25), atol=1e-5)
+    np.testing.assert_allclose(slow[1520][0], np.exp(-520 / 250), atol=1e-3)
+
+def test_peaks_hold_then_fall():
+    steps = smoothed_steps(0.02, seconds=3.0)
+    top = steps[1000][1]
+    for ms in range(1020, 3000, 20):
+        level, peak = steps[ms]
+        assert peak >= level
+        if ms - 1000 < 500:
+            assert peak == top
+        else:
+            # 500 ms hold, then a 400 ms exponential fall, not below the level
+            np.testing.assert_allclose(peak, max(top * np.exp(-(ms - 1000 - 500) / 400), level), rtol=1e-4)
@@ -1,178 +1,240 @@
+import StartupProfiler
+from StartupProfiler import profiler  # first, so --profile-startup times include every import
 import tkinter as tk
 from tkinter import scrolledtext
-import pyaudiowpatch as pyaudio
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import threading
 import os
 import ctypes
 import time
 
-# transcriber libraries
+# transcriber libraries, whisper / torch are only imported by the background loader
 import queue
-from AudioTranscriber import AudioTranscriber
-import AudioRecorder
 import sys
-import TranscriberModels
-import subprocess
+import argparse
+import SpectrumAnalyzer
+from SpectrumAnalyzer import SpectrogramBuffer, SpectrumPipeline, CHUNK, FFT_SIZE, HOP_SIZE, MAX_LEVEL
+from WaterfallRenderer import WaterfallRenderer
+from FrameExchange import FrameExchange
+from RenderScheduler import RenderScheduler
+from CaptureEngine import CaptureEngine
+from PauseSignal import PauseSignal
+import CaptureBackends
+import AudioTranscriber
 
 # Constants
-FORMAT = pyaudio.paInt16
-CHANNELS = 1
-CHUNK = 1024
-UPDATE_INTERVAL = 75  # milliseconds
+TARGET_FPS = 30  # EQ redraw rate while something is playing, lowered automatically if draws overrun
+IDLE_INTERVAL = 500  # milliseconds between checks when nothing changes or the window is minimized
+ATTACK_MS = 25  # bar smoothing time constants, applied per hop in the DSP thread
+RELEASE_MS = 250
+PEAK_HOLD_MS = 500
+PEAK_FALL_MS = 400
+PEAK_MARKER_HEIGHT = 1e5
+DRAW_THRESHOLD = MAX_LEVEL / 1000  # skip redraws when no bar or peak moved more than this
+WATERFALL_HISTORY = 2048  # spectra kept for the waterfall view, ~44s at 48KHz
 TEXT_LINES = 10
+TRANSCRIPT_POLL_INTERVAL = 100  # milliseconds between checks of the transcriber's change flag
 COLOR_MAIN = '#2E3440'
 COLOR_SIDE = '#A3BE8C'
+COLOR_SIDE_ALT = '#88C0D0'
 COLOR_SEP = '#4C566A'
+MAX_TICK_LABELS = 12  # with 64+ bars only every nth bar gets a label
+FRAME_STATS_INTERVAL = 5  # seconds between frame time reports with --frame-stats
+PROFILE_TIMEOUT = 120  # seconds --profile-startup waits for the first transcript before reporting without it
 
 class LiveLogScaleBarChartApp:
-    def __init__(self, root):
+    def __init__(self, root, capture_reader, channel_mode='downmix', bars=None, octave_fraction=None, weighting='flat',
+                 view='bars', backend='matplotlib', blit=True, frame_stats=False, target_fps=TARGET_FPS):
         self.root = root
         self.root.title("System Sound Frequency Visualizer")
 
-        # PyAudio setup
-        self.p = pyaudio.PyAudio()
+        # own cursor into the capture engine shared with the transcriber
+        self.capture_reader = capture_reader
+        self.capture = capture_reader.engine
+        self.sample_rate = self.capture.sample_rate
+        self.channels = self.capture.channels
+        print("Default SR", self.sample_rate)
+
+        self.spectrum = SpectrumPipeline(self.sample_rate, self.channels, channel_mode, bars, octave_fraction,
+                                         FFT_SIZE, HOP_SIZE, weighting,
+                                         ATTACK_MS, RELEASE_MS, PEAK_HOLD_MS, PEAK_FALL_MS)
+        self.frequency_bins, self.ax_ticks = self.spectrum.frequency_bins, self.spectrum.labels
+        state_shape = self.spectrum.smoother.state.shape
+        self.frame_exchange = FrameExchange(state_shape)
+        self.drawn_frame = np.zeros(state_shape, dtype=np.float32)
+        self.frame_delta = np.zeros(state_shape, dtype=np.float32)
 
-        try:
-            # Get default WASAPI info
-            wasapi_info = self.p.get_host_api_info_by_type(pyaudio.paWASAPI)
-        except OSError:
-            exit()
-
-        # Get default WASAPI speakers
-        default_speakers = self.p.get_device_info_by_index(wasapi_info["defaultOutputDevice"])
-
-        if not default_speakers["isLoopbackDevice"]:
-            for loopback in self.p.get_loopback_device_info_generator():
-                if default_speakers["name"] in loopback["name"]:
-                    default_speakers = loopback
-                    break
-            else:
-                exit()
-
-        print("Default SR", int(default_speakers["defaultSampleRate"]))
-
-        self.stream = self.p.open(
-            format=pyaudio.paInt16,
-            channels=default_speakers["maxInputChannels"],
-            rate=int(default_speakers["defaultSampleRate"]),
-            frames_per_buffer=CHUNK,
-            input=True,
-            input_device_index=default_speakers["index"]
-        )
-
-        # Modify plot look
-        self.fig, self.ax = plt.subplots()
-        self.fig.set_facecolor(COLOR_MAIN)
-        self.ax.set_facecolor(COLOR_MAIN)
-        self.ax.spines['left'].set_visible(False)
-        self.ax.spines['right'].set_visible(False)
-        self.ax.spines['top'].set_visible(False)
-        self.ax.spines['bottom'].set_visible(False)
-        self.ax.xaxis.set_ticks_position('none')
-        self.ax.tick_params(axis='x', rotation=45)
-        self.fig.subplots_adjust(left=0, right=1, top=1)
-
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.root)
-        self.canvas_widget = self.canvas.get_tk_widget()
-        self.canvas_widget.grid(row=0, column=0, sticky="nsew", pady=(0, 10))
         self.root.geometry(f"{int(self.root.winfo_screenwidth() * 0.3)}x{int(self.root.winfo_screenheight() * 0.7)}")
-        self.canvas.draw() # resolve rendering issues w 1 px white line on right
-
-        # Bass 0 - 250, Mids 250 - 4K, highs (presence and brilliance) -> 22K
-        self.frequency_bins = [64, 128, 256, 512, 1000, 2000, 4000, 8000, 16000, 22000]
-        self.ax_ticks = ['64', '128', '256', '512', '1K', '2K', '4K', '8K', '16K', '22K']
-        self.bar_positions = np.arange(len(self.frequency_bins))
-
-        self.ax.set_xticks(list(range(len(self.frequency_bins))))
-        self.ax.set_xticklabels(self.ax_ticks, color=COLOR_SIDE)
-
-        # Create an initial empty bar chart
-        self.bars = self.ax.bar(
-            self.bar_positions,
-            np.zeros_like(self.frequency_bins),
-            color=COLOR_SIDE,  # Nord Green color
-        )
-        self.ax.set_ylim(1, 1e7)  # Adjust the y-axis limits based on your data
-        #plt.axis('off')
-        plt.gca().get_yaxis().set_visible(False)
-        #plt.tick_params(axis='both', left=False, top=False, right=False, bottom=False, labelleft=False,
-        #                labeltop=False, labelright=False, labelbottom=False)
+        self.waterfall = None
+        if view == 'waterfall':
+            # scrolling spectrogram of the first channel set instead of the bar chart
+            self.spectrogram = SpectrogramBuffer(WATERFALL_HISTORY, len(self.frequency_bins), MAX_LEVEL)
+            self.waterfall = WaterfallRenderer(self.root, self.spectrogram, COLOR_MAIN)
+            self.waterfall.grid(row=0, column=0, sticky="nsew", pady=(0, 10))
+        else:
+            renderer_args = (self.root, len(self.frequency_bins), self.ax_ticks, self.spectrum.n_sets,
+                             (COLOR_SIDE, COLOR_SIDE_ALT),  # Nord Green, Nord Frost for the second set
+                             COLOR_MAIN)
+            renderer_kwargs = dict(ylim=1e7, peak_height=PEAK_MARKER_HEIGHT, max_tick_labels=MAX_TICK_LABELS)
+            # renderer modules are imported here so the tk backend never loads matplotlib
+            if backend == 'tk':
+                from TkRenderer import TkBarRenderer
+                self.renderer = TkBarRenderer(*renderer_args, **renderer_kwargs)
+            else:
+                from MatplotlibRenderer import BlitBarRenderer
+                self.renderer = BlitBarRenderer(*renderer_args, **renderer_kwargs, blit=blit)
+            self.renderer.grid(row=0, column=0, sticky="nsew", pady=(0, 10))
+        self.frame_stats = frame_stats
+        self.last_stats_report = time.perf_counter()
 
         # Tkinter setup
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.bind("<w>", self.cycle_weighting)
 
         # Use a thread for audio processing
         self.audio_thread = threading.Thread(target=self.audio_processing_thread)
         self.audio_thread.daemon = True  # The thread will exit when the main program exits
         self.audio_thread.start()
 
-        self.root.after(UPDATE_INTERVAL, self.update)
+        self.scheduler = RenderScheduler(self.root, self.update, target_fps, IDLE_INTERVAL)
+        self.scheduler.start()
         self.root.mainloop()
 
     def audio_processing_thread(self):
         while True:
             # Read audio data
-            data = np.frombuffer(self.stream.read(CHUNK, exception_on_overflow=False),
-                                  dtype=np.int16)
-            # Inside the update method, before computing the FFT
-            window = np.hamming(len(data))
-            data = data * window
-            spectrum = np.fft.fft(data)[:CHUNK // 2]
-            amplitude = np.abs(spectrum)
-            #magic number conversion based on system sound sample rate of 48KHz
-            splits = [1, 3, 5, 10, 18, 37, 73, 146, 293]
-            inter_amplitude = np.split(amplitude, splits)
-            amplitude = np.array([part.sum()/(len(part)**(1/5)) for part in inter_amplitude])
-            self.amplitude_data = np.clip(amplitude, a_min=None, a_max=9.5*1e6)
+            data = self.capture_reader.read(CHUNK)
+            if data is None:
+                return
+            for bands, state in self.spectrum.process(data):
+                # smoothed levels and peaks, the Tk loop only has to draw them
+                self.frame_exchange.publish(state, max_value=MAX_LEVEL)
+                if self.waterfall is not None:
+                    self.spectrogram.push(bands[0])
 
     def update(self):
-        # Access the shared variable for amplitude data
-        amplitude = getattr(self, 'amplitude_data', None)
-
-        if amplitude is not None:
-            # Update the bar chart
-            for bar, amp in zip(self.bars, amplitude):
-                bar.set_height(amp)
-
-            # Draw the updated plot on the Tkinter canvas
-            self.canvas.draw()
-
-        # Schedule the next update
-        self.root.after(UPDATE_INTERVAL, self.update)
+        # called by the RenderScheduler, returns whether anything was drawn
+        if self.waterfall is not None:
+            # only uploads the spectra pushed since the last update
+            drew = self.waterfall.draw()
+            if drew:
+                profiler.mark("first_frame")
+            return drew
+
+        # newest smoothed (levels, peaks) state, None when the DSP thread hasn't produced a new one
+        frame = self.frame_exchange.take()
+        drew = False
+
+        if frame is not None:
+            profiler.mark("first_frame")
+            # skip frames that wouldn't visibly move anything
+            np.subtract(frame, self.drawn_frame, out=self.frame_delta)
+            np.abs(self.frame_delta, out=self.frame_delta)
+            if self.frame_delta.max() > DRAW_THRESHOLD:
+                np.copyto(self.drawn_frame, frame)
+                # Draw the updated bars on the Tkinter canvas
+                levels, peaks = frame
+                self.renderer.draw(levels, peaks)
+                drew = True
+
+        if self.frame_stats and time.perf_counter() - self.last_stats_report > FRAME_STATS_INTERVAL:
+            self.last_stats_report = time.perf_counter()
+            age = self.frame_exchange.age()
+            print(f"[INFO] EQ frame time {self.renderer.frame_time_ms:.2f} ms ({self.renderer.description}), "
+                  f"dropped {self.frame_exchange.dropped}, duplicated {self.frame_exchange.duplicated}, "
+                  f"last DSP frame {'never' if age is None else f'{age * 1000:.0f} ms ago'}, "
+                  f"redraw every {self.scheduler.interval_ms:.0f} ms, "
+                  f"capture overruns {self.capture_reader.overruns} ({self.capture_reader.lost_frames} frames lost)")
+        return drew
+
+    def cycle_weighting(self, event=None):
+        # gain vectors are cached per curve, the DSP thread picks the new one up on its next frame
+        print("[INFO] EQ weighting:", self.spectrum.weighting.next_curve())
 
     def on_close(self):
         # Clean up resources when the window is closed
-        self.stream.stop_stream()
-        self.stream.close()
-        self.p.terminate()
+        self.capture.close()
+        profiler.finish()
         self.root.destroy()
         exit()
 
-def update_transcript_UI(transcriber, scrolled_text):
-    transcript_string = transcriber.get_transcript()
-    scrolled_text.delete(1.0, tk.END)
-    scrolled_text.insert(tk.END, transcript_string)
-    scrolled_text.see(tk.END)
-    time.sleep(300/1000)
+class TranscriptView:
+    """
+    Keeps the transcript pane in sync from the Tk main loop.
 
-    update_transcript_UI(transcriber, scrolled_text)
+    Polls ``transcript_changed_event`` (a cheap flag check when nothing happened) and applies only the
+    transcriber's pending changes: each phrase is a text tag, so an in-progress phrase is replaced in place,
+    new phrases are inserted by the capture time they started at (after the phrases of other sources that
+    started earlier) and trimmed ones deleted, at a cost proportional to what changed.
 
-def transcriberWindow(root, initial_width, initial_height):
-    try:
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except FileNotFoundError:
-        print("ERROR: The ffmpeg library is not installed. Please install ffmpeg and try again.")
-        return
-    
+    Until the background loader hands over a ``transcriber`` the pane shows ``status`` instead, the loader
+    only assigns attributes, all widget updates stay on the Tk thread.
+    """
+    def __init__(self, root, scrolled_text, status="Loading transcription model..."):
+        self.root = root
+        self.scrolled_text = scrolled_text
+        self.transcriber = None
+        self.phrase_starts = {}  # tag -> capture time the phrase started at
+        self.status = status
+        self.shown_status = None
+        self.root.after(0, self.poll)
+
+    def poll(self):
+        if self.transcriber is None:
+            if self.status != self.shown_status:
+                self.shown_status = self.status
+                self.scrolled_text.delete(1.0, tk.END)
+                self.scrolled_text.insert(tk.END, self.status, "status")
+            self.root.after(TRANSCRIPT_POLL_INTERVAL, self.poll)
+            return
+        if self.shown_status is not None:
+            self.shown_status = None
+            self.scrolled_text.delete(1.0, tk.END)
+
+        if self.transcriber.transcript_changed_event.is_set():
+            self.transcriber.transcript_changed_event.clear()
+            for change in self.transcriber.pop_transcript_changes():
+                self.apply(change)
+            self.scrolled_text.see(tk.END)
+        self.root.after(TRANSCRIPT_POLL_INTERVAL, self.poll)
+
+    def apply(self, change):
+        text = self.scrolled_text
+        if change[0] == "clear":
+            text.delete(1.0, tk.END)
+            for tag in text.tag_names():
+                if tag.startswith("phrase"):
+                    text.tag_delete(tag)
+            self.phrase_starts.clear()
+            return
+
+        tag = f"phrase{change[1]}"
+        ranges = text.tag_ranges(tag)
+        if change[0] == "set":
+            profiler.mark("first_transcript")
+            profiler.finish()
+            if ranges:
+                # in-progress phrase, replace it where it is
+                text.delete(*ranges)
+                text.insert(ranges[0], change[2], tag)
+            else:
+                later = [other for other, started in self.phrase_starts.items() if started > change[4]]
+                index = text.tag_ranges(min(later, key=self.phrase_starts.get))[0] if later else tk.END
+                text.insert(index, change[2], tag)
+                self.phrase_starts[tag] = change[4]
+        elif change[0] == "remove":
+            if ranges:
+                text.delete(*ranges)
+            text.tag_delete(tag)
+            self.phrase_starts.pop(tag, None)
+
+def transcriberWindow(root, capture_reader, initial_width, initial_height, options=None, mic=False):
     uparrow = tk.StringVar()
     uparrow.set('\u25B2')
     downarrow = tk.StringVar()
     downarrow.set('\u25BC')
 
-    pause_transcribe = threading.Event()
+    pause_transcribe = PauseSignal()
     def hide_transcribe():
         if transcribe_box.winfo_viewable():
             pause_transcribe.set()
@@ -205,31 +267,87 @@ def transcriberWindow(root, initial_width, initial_height):
     scrolled_text.vbar.pack_forget()  # default windows scrollbar ugly af
 
     audio_queue = queue.Queue()
-    speaker_audio_recorder = AudioRecorder.DefaultSpeakerRecorder()
-    speaker_audio_recorder.record_into_queue(audio_queue, pause_transcribe,)
-    model = TranscriberModels.get_model('--api' in sys.argv)
-    transcriber = AudioTranscriber(speaker_audio_recorder.source, model)
+    view = TranscriptView(root, scrolled_text)
+    loader = threading.Thread(target=load_transcriber, args=(view, capture_reader, audio_queue, pause_transcribe, options, mic))
+    loader.daemon = True
+    loader.start()
+
+def load_transcriber(view, capture_reader, audio_queue, pause_transcribe, options=None, mic=False):
+    # runs off the Tk thread so the EQ is up while the model loads, the pane shows view.status meanwhile
+    try:
+        import AudioRecorder
+        import TranscriberModels
+
+        view.status = "Calibrating for ambient noise..."
+        recorders = AudioRecorder.open_recorders(capture_reader, mic)
+        view.status = "Loading transcription model..."
+        model = TranscriberModels.get_model('--api' in sys.argv)
+        transcriber = AudioTranscriber.AudioTranscriber(model, **(options or {}))
+        # recording starts only once there's a model, nothing fills the queue if loading fails
+        AudioRecorder.start_recording(recorders, transcriber, audio_queue, pause_transcribe)
+    except Exception as e:
+        print(f"[ERROR] Transcription unavailable: {e}")
+        view.status = f"Transcription unavailable: {e}"
+        capture_reader.close()  # a replay mustn't wait for it
+        return
+
     transcribe = threading.Thread(target=transcriber.transcribe_audio_queue, args=(audio_queue, pause_transcribe,))
     transcribe.daemon = True
     transcribe.start()
-
-    text_thread = threading.Thread(target=update_transcript_UI, args=(transcriber, scrolled_text))
-    text_thread.daemon = True  # The thread will exit when the main program exits
-    text_thread.start()
+    view.transcriber = transcriber
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Desktop audio visualizer + transcriber")
+    parser.add_argument('--api', action='store_true', help="transcribe with the whisper API")
+    parser.add_argument('--waterfall', action='store_true', help="scrolling spectrogram instead of bars")
+    parser.add_argument('--tk', action='store_true', help="draw the bars on a plain Tk canvas, without matplotlib")
+    parser.add_argument('--no-blit', action='store_true', help="redraw the whole bar chart every frame")
+    parser.add_argument('--fps', type=int, default=TARGET_FPS, help="target EQ redraw rate")
+    parser.add_argument('--frame-stats', action='store_true', help="print the measured EQ frame time")
+    parser.add_argument('--record', metavar='FILE', help="also write the captured audio to a WAV file")
+    StartupProfiler.add_arguments(parser)
+    SpectrumAnalyzer.add_arguments(parser)
+    CaptureBackends.add_arguments(parser)
+    AudioTranscriber.add_arguments(parser)
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    root = tk.Tk()
+    args = parse_args()
+    if args.profile_startup:
+        profiler.enable(args.profile_startup, PROFILE_TIMEOUT)
+        profiler.mark("imports")
+    try:
+        # single capture shared by the EQ, the transcriber and the recorder
+        with profiler.phase("capture open"):
+            capture = CaptureEngine(CaptureBackends.from_args(args, CHUNK), CHUNK)
+    except (OSError, RuntimeError):
+        exit()
+    # readers attached before the start see the source from its first frame
+    spectrum_reader = capture.reader("spectrum")
+    transcription_reader = capture.reader("transcription")
+    if args.record:
+        capture.record(args.record)
+    capture.start()
+
+    with profiler.phase("tk init"):
+        root = tk.Tk()
     root.configure(background=COLOR_MAIN)
     initial_width = int(root.winfo_screenwidth() * 0.3)
     initial_height = int(root.winfo_screenheight() * 0.7)
     root.grid_rowconfigure(0, weight=1)
     root.grid_columnconfigure(0, weight=1)
     
-    icon_path = os.path.abspath('./static/favicon.ico')
-    root.iconbitmap(icon_path)
-    transcriberWindow(root, initial_width, initial_height)
-
-    # windows won't display icon on taskbar w/o AppModelId
-    ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID('DesktopVisualizer2.2')
-
-    app = LiveLogScaleBarChartApp(root)
+    if os.name == 'nt':
+        icon_path = os.path.abspath('./static/favicon.ico')
+        root.iconbitmap(icon_path)
+    transcriberWindow(root, transcription_reader, initial_width, initial_height,
+                      AudioTranscriber.options_from_args(args), args.mic)
+
+    if os.name == 'nt':
+        # windows won't display icon on taskbar w/o AppModelId
+        ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID('DesktopVisualizer2.2')
+
+    app = LiveLogScaleBarChartApp(root, spectrum_reader, **SpectrumAnalyzer.options_from_args(args),
+                                  view='waterfall' if args.waterfall else 'bars',
+                                  backend='tk' if args.tk else 'matplotlib',
+                                  blit=not args.no_blit, frame_stats=args.frame_stats, target_fps=args.fps)